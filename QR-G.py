@@ -7,45 +7,52 @@
 # - tkinter (usually included with Python)
 # - qrcode: pip install "qrcode[pil]"
 # - Pillow (PIL): installed with the command above
+#
+# Headless batch mode (no window, tkinter is never imported):
+#   python3 QR-G.py batch manifest.csv -o output_dir
+
+import sys
+
+# --- Command-line mode: dispatch before any GUI imports ---
+if __name__ == "__main__" and len(sys.argv) > 1:
+    from qrg.cli import main
+    sys.exit(main())
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import qrcode
-import qrcode.image.svg
-from PIL import Image, ImageTk
 import os
-import base64
-from io import BytesIO
-import webbrowser
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from qrg.lazy import LazyModule
+
+# --- Heavy modules, imported on first use so the window appears sooner ---
+Image = LazyModule("PIL.Image")
+ImageTk = LazyModule("PIL.ImageTk")
+engine = LazyModule("qrg.engine")
+metrics = LazyModule("qrg.metrics")
 
 # --- Constants ---
 APP_TITLE = "InterCuba.Net QR Code Generator"
-WINDOW_SIZE = "520x650" # Increased height for footer
-
-# --- App Icon (Base64 encoded to avoid external files) ---
+WINDOW_SIZE = "520x750" # Increased height for footer and live QR preview
+POLL_INTERVAL_MS = 50 # How often the UI checks on a running generation job
+PREVIEW_DELAY_MS = 250 # Typing pause before the live preview re-renders
+PREVIEW_SIZE = 160 # Max edge of the live QR preview, in pixels
+SHOW_TIMINGS = bool(os.environ.get("QRG_SHOW_TIMINGS")) # Append stage timings to the status bar
+ERROR_CORRECTION = "auto" # Lowest ECC level that keeps the logo readable (M without a logo)
+ALL_FORMATS = "All Formats (Web, Print, SVG)" # Saves every engine.STANDARD_RENDITIONS from one encode
+JOB_STAGES = {"encode": "Encoding...", "render": "Rendering...", "write": "Saving..."} # Status per engine stage
+
+# --- App Icon (Base64 PNG, decoded natively by Tk without Pillow) ---
 # Icon: A simple, modern QR code graphic
-ICON_DATA = b"""
-iVBORw0KGgoAAAANSUhEUgAAAEAAAABACAYAAACqaXHeAAAEcElEQVR4nO2by4sVVRjGn/fOuffMnYkzl
-yQaH5rgRhceKqUg6MIlXYhuRAnu3LhR8A+4E2/iRkARwY1gV5tuBEGE3Ysuws4l4UYXpWgmRzMzmTOfe+7
-Uqe4prprp6Z6q3vVp/2Bp1VXVb/1v+qsqn/dAwRBEARBEARBEARBEARBEARB8J8gqNVq6Xa722y2Wq1uNJ
-ttN/p8Pv8/YGb7fX9brVbrtNvtNpvNbrfbfT5fjMbD/BqDwQDP56PRaPT7/Vwud7PZjMfjJicn+n0+M6/W
-6/Wi0SgSicBut2s0Gg6HA4vFok6ns9lsVqs1n89jsVg0Go0wDAwGA4VCIRqNGo1GDocDlmXR6XQajSYYDM
-jlcplMJpfL5XK5zGaz2+0ajcZisfC9RqOByWTC8zxVVVVVdf7P3P92fX39/Pz80NDQwMCAgICAgIDg5eUl
-JibGxsZGJpMJBAKEw+FAICAYDAaDwYDAeDwaDIbFYjEYDFp7enra2tpiY2OjoqIiLy8vMDBQp9MZDAZptV
-qpVOJ5ngzDIBgM0el0kiThwWBQq9UajYbL5TJbLAaDAYfDAZ7nJ0+ePHr06KNHj548efLXr1+Ojo7asmXL
-unXrli5d2rp16+PHj58+ffrkyZMnT548+e/XrwMCAvLysqioKC8vDwkJ0ev1MpnMZrNpNBqfz+fxeAoLCx
-MTE7Ozs5OTk5OTk2NjY2NjYxMTEwsLC/Pz83fv3l2/fv2GDRs2bNiQnZ1dUlKSk5Pz4sWLp0+fvnv37tOn
-T1++fPnu3buHDx8+f/789evXv//+u3Dhwr1793bu3Llz584DBw4cO3asurpaU1NTWlpaXV3d0NBQbW1tZW
-VlRUVFYWFhYWHhwMBAVVXV1NTU3NzcysoqvG/YsGF1dfX+/ftXr1598uTJEyZM2Lp1a2VlpcjISHx8fGBg
-IH19fWZmZnZ2dnZ2NiAgwGaz8Xq9rutGo5HNZnM4HLqum0wmm82Wz+ep1WqDwSAej+N5/vTp08ePH8/Pz0
-9PT4+Ojj5//vzhw4fn5+fXr18PDw8PDg729fXduXPH3r17d+7c6XA4cnNza2pqCgsLGxoaqqur5+bmoNPp
-oNfrlUoldrvd6/WazWYqlcqCgoKCgoKgoCBVVVVeXl5tbW1sbGxoaGhtbW1ramppaWltbW1jY2NtbQ19ff
-2TJ0+ePXv25MmTX19fr127duPGjVOnTq1Zs6awsPD8+fPnz58/efLk/Pz88vJyXl7e/fv3jx8/Pjg4GBsb
-u3DhQm1tbVFREalUSkdHR2VlZWpqamFhYXt7+/z8/P7+fkBAAE3TlmVZlmVZlmVd13Vd13Vd13VdVavVzW
-aTTqfT6bTValWr1Wq1Wq1Wu67rur/ruq5pmsaZpmkaZpqm6bqum6ZpGub/jGkaZp7n+TzPc3w+nyzLsixb
-VVXVNE03DMNgMBhVVU0mkwzDMMsajUatViORSCRSqVSpVEomk5qm+Tz/H+C3v/W1A/i/36PRuGmavq7ruq
-7ruq5pmsaZpmme5/k8n8/n8/V63e/3+/0+nuf1ej0+n89kMsEwvK6q1+tVVVVVVRVNU9d1nucpFAqVSiUej
-eN5/q8KgiAIgiAIgiAIgiAIgiAIgvhf+QfXn4aM/0rP/AAAAABJRU5ErkJggg==
+ICON_DATA = """
+iVBORw0KGgoAAAANSUhEUgAAAEAAAABAAQMAAACQp+OdAAAABlBMVEX///8Aev+tEK2PAAAA9ElE
+QVR42mNgoAgwMv771SfEltDIBBNhYmhUKEr4ycSAJCJfr8bG+ANZhIHhZ2UDA0KEhYGB8ZkUIwOy
+mocNHQn/OZBF6h8IK7b/Q4gwMDAwzm9jQNLFzPjjb47HHw5bJF0vnjcwzH+ArKvyH1sa488GJBG5
+hATJmahqfqS3yTE2ILu5v0ryARtCDSPjg+0nW40S2ZF0sSU+b2NHMoeF8YHRf/kf7Ui6GBgYv2cq
+MPxHmMz4/3vbAgkUXzDErn3NyFqLZNe8n/kPJJr+I6nx/yt0V/FtIbLIvxS/76q8SCIGvVx3VGY2
+MCHH1/OZ8iflmRioAwByRUn7bsWTfwAAAABJRU5ErkJggg==
 """
 
 # --- Color and Font Palette (Inspired by modern UI design) ---
@@ -89,15 +96,30 @@ class QRCodeApp(tk.Tk):
         self.logo_image = None # To hold a reference to the logo PhotoImage
         self.app_icon = None   # To hold a reference to the app icon
 
+        # --- Background generation (keeps the window responsive) ---
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._job = None  # (future, cancel event, file path) while generating
+        self._job_stages = queue.Queue()
+        self._last_timings = "" # Stage breakdown of the last finished job
+        self._last_code = ""    # Version and ECC level of the last saved code
+        self._last_saved = ""   # File name(s) written by the last job
+
+        # --- Live preview (debounced, rendered off the UI thread) ---
+        self._preview_executor = ThreadPoolExecutor(max_workers=1)
+        self._preview_after = None  # Pending debounce timer
+        self._preview_token = 0     # Bumped per request; stale renders are dropped
+        self._preview_qr = None     # (content, logo, EncodedQR, logo drawn) of the last encode, reused if unchanged
+        self.qr_preview_image = None
+
         # --- UI Creation ---
         self._create_widgets()
+        self.url_var.trace_add('write', self._schedule_preview)
+        self.logo_path_var.trace_add('write', self._schedule_preview)
         
     def _set_app_icon(self):
-        """Sets the application icon from base64 data."""
+        """Sets the application icon from base64 PNG data (Tk decodes it natively)."""
         try:
-            image_data = base64.b64decode(ICON_DATA)
-            image = Image.open(BytesIO(image_data))
-            self.app_icon = ImageTk.PhotoImage(image)
+            self.app_icon = tk.PhotoImage(data=ICON_DATA)
             self.iconphoto(True, self.app_icon)
         except Exception as e:
             print(f"Error setting app icon: {e}") # Log error but don't crash
@@ -169,7 +191,7 @@ class QRCodeApp(tk.Tk):
 
         # --- Logo Selection ---
         ttk.Label(main_frame, text="Logo").grid(row=4, column=0, sticky='w', pady=(20, 5))
-        ttk.Label(main_frame, text="(Optional, for PNG output)", style='Secondary.TLabel').grid(
+        ttk.Label(main_frame, text="(Optional)", style='Secondary.TLabel').grid(
             row=4, column=1, sticky='w', pady=(20, 5), padx=(5,0))
 
         self.logo_path_entry = ttk.Entry(main_frame, textvariable=self.logo_path_var, state='readonly', width=30)
@@ -180,19 +202,32 @@ class QRCodeApp(tk.Tk):
 
         # --- Logo Preview ---
         self.logo_preview_label = ttk.Label(main_frame, text="No logo selected", style='Secondary.TLabel', anchor='center')
-        self.logo_preview_label.grid(row=6, column=0, columnspan=2, pady=10, sticky='ewns')
-        main_frame.grid_rowconfigure(6, minsize=70) # Set minimum height for the preview area
+        self.logo_preview_label.grid(row=6, column=0, pady=10, sticky='ewns')
+
+        # --- Live QR Preview ---
+        self.qr_preview_label = ttk.Label(main_frame, text="QR preview", style='Secondary.TLabel', anchor='center')
+        self.qr_preview_label.grid(row=6, column=1, pady=10, sticky='ewns')
+        main_frame.grid_rowconfigure(6, minsize=PREVIEW_SIZE + 10) # Set minimum height for the preview area
 
         # --- Output Type Selection ---
         ttk.Label(main_frame, text="Output Format").grid(row=7, column=0, columnspan=2, sticky='w', pady=(20, 5))
         output_combo = ttk.Combobox(main_frame, textvariable=self.output_format_var,
-                                    values=["PNG (Digital)", "SVG (Print)"], state='readonly')
+                                    values=["PNG (Digital)", "SVG (Print)", ALL_FORMATS], state='readonly')
         output_combo.grid(row=8, column=0, columnspan=2, sticky='ew', ipady=5)
-        output_combo.bind("<<ComboboxSelected>>", self._toggle_logo_state)
 
         # --- Generate Button ---
-        generate_button = ttk.Button(main_frame, text="Generate QR Code", style='Accent.TButton', command=self._generate_qr)
-        generate_button.grid(row=9, column=0, columnspan=2, sticky='ew', pady=(30, 10))
+        self.generate_button = ttk.Button(main_frame, text="Generate QR Code", style='Accent.TButton', command=self._generate_qr)
+        self.generate_button.grid(row=9, column=0, columnspan=2, sticky='ew', pady=(30, 10))
+
+        # --- Progress (replaces the Generate button while a job runs) ---
+        self.progress_frame = ttk.Frame(main_frame, style='TFrame')
+        self.progress_frame.grid(row=9, column=0, columnspan=2, sticky='ew', pady=(30, 10))
+        self.progress_frame.columnconfigure(0, weight=1)
+        self.progress_bar = ttk.Progressbar(self.progress_frame, mode='indeterminate')
+        self.progress_bar.grid(row=0, column=0, sticky='ew')
+        ttk.Button(self.progress_frame, text="Cancel", command=self._cancel_generation).grid(
+            row=0, column=1, padx=(10, 0))
+        self.progress_frame.grid_remove()
 
         # --- Status Bar ---
         status_label = ttk.Label(self, textvariable=self.status_var, font=FONT_STATUS,
@@ -216,6 +251,7 @@ class QRCodeApp(tk.Tk):
 
     def _open_link(self, url):
         """Opens the given URL in the default web browser."""
+        import webbrowser
         webbrowser.open_new(url)
 
     def _select_logo(self):
@@ -239,95 +275,213 @@ class QRCodeApp(tk.Tk):
             self.logo_path_var.set("") # Clear path if image is invalid
             self.logo_preview_label.config(image='', text="Invalid Image")
 
-    def _toggle_logo_state(self, event=None):
-        """Enables/disables the logo selection based on output format."""
-        if self.output_format_var.get() == "SVG (Print)":
-            self.browse_button.config(state='disabled')
-            self.logo_path_entry.config(state='disabled')
-            self.status_var.set("Logo is not supported for SVG output.")
+    def _schedule_preview(self, *args):
+        """Debounces preview renders: only the last change in a burst renders."""
+        if self._preview_after is not None:
+            self.after_cancel(self._preview_after)
+        self._preview_after = self.after(PREVIEW_DELAY_MS, self._start_preview)
+
+    def _start_preview(self):
+        """Hands the current content and logo to the preview worker."""
+        self._preview_after = None
+        self._preview_token += 1
+        url = self.url_var.get().strip()
+        if not url:
+            self.qr_preview_image = None
+            self.qr_preview_label.config(image='', text="QR preview")
+            return
+
+        # Reuse the last encode when neither content nor logo changed
+        logo_path = self.logo_path_var.get()
+        cached = None
+        if self._preview_qr and self._preview_qr[:2] == (url, logo_path):
+            cached = self._preview_qr[2:]
+        future = self._preview_executor.submit(self._preview_job, self._preview_token, url,
+                                               logo_path, cached)
+        self.after(POLL_INTERVAL_MS, self._poll_preview, future, self._preview_token)
+
+    def _preview_job(self, token, url, logo_path, cached):
+        """
+        Renders a small preview on the worker thread. Must not touch Tk.
+
+        cached is the (qr, drawn logo) of the last preview for the same
+        content and logo, or None. Returns None when a newer request
+        superseded this one.
+        """
+        if token != self._preview_token:
+            return None
+        if cached is not None:
+            qr, drawn_logo = cached
         else:
-            self.browse_button.config(state='normal')
-            self.logo_path_entry.config(state='readonly')
-            self.status_var.set("Ready.")
+            drawn_logo = logo_path
+            try:
+                qr = engine.make_qr(url, ERROR_CORRECTION, logo_path=logo_path)
+            except engine.LogoError:
+                drawn_logo = None  # Preview the code without the logo, as it would be saved
+                qr = engine.make_qr(url, ERROR_CORRECTION)
+        if token != self._preview_token:
+            return None # Skip rendering a matrix nobody will see
+
+        box_size = max(1, PREVIEW_SIZE // len(qr.get_matrix()))
+        try:
+            img = engine.render_png(qr, drawn_logo, box_size=box_size)
+        except engine.LogoError:
+            img = engine.render_png(qr, box_size=box_size)
+        return token, url, logo_path, qr, drawn_logo, img.to_image()
+
+    def _poll_preview(self, future, token):
+        """Shows the finished preview, unless a newer one was requested."""
+        if not future.done():
+            self.after(POLL_INTERVAL_MS, self._poll_preview, future, token)
+            return
+        if token != self._preview_token:
+            return
+        try:
+            result = future.result()
+        except engine.GenerationError as e:
+            self.qr_preview_image = None
+            self.qr_preview_label.config(image='', text=str(e), wraplength=PREVIEW_SIZE)
+            return
+        if result is None:
+            return
+
+        _, url, logo_path, qr, drawn_logo, img = result
+        self._preview_qr = (url, logo_path, qr, drawn_logo)
+        self.qr_preview_image = ImageTk.PhotoImage(img) # Keep a reference
+        self.qr_preview_label.config(image=self.qr_preview_image, text="")
 
     def _generate_qr(self):
-        """Validates input and generates the QR code."""
+        """Validates input and starts generating the QR code in the background."""
+        if self._job is not None:
+            return # A job is already running; ignore repeat clicks
+
         url = self.url_var.get().strip()
         logo_path = self.logo_path_var.get()
-        output_format = self.output_format_var.get()
+        output_format = {"SVG (Print)": "svg", ALL_FORMATS: "all"}.get(self.output_format_var.get(), "png")
 
         if not url:
             messagebox.showerror("Error", "URL cannot be empty.")
             self.status_var.set("Error: URL is required.")
             return
 
+        # File dialogs must run on the UI thread, so ask before starting the job
+        file_path = self._ask_save_path(output_format)
+        if not file_path:
+            self.status_var.set("Save operation cancelled.")
+            return
+
+        cancel_event = threading.Event()
+        future = self._executor.submit(self._generation_job, url, output_format,
+                                       logo_path, file_path, cancel_event)
+        self._job = (future, cancel_event, file_path)
+        self._set_busy(True)
         self.status_var.set("Generating, please wait...")
-        self.update_idletasks() # Refresh the UI to show the message
+        self.after(POLL_INTERVAL_MS, self._poll_generation)
+
+    def _ask_save_path(self, output_format):
+        """Asks where to save the QR code. Returns '' if cancelled."""
+        if output_format == "all":
+            # Each rendition is saved next to this name, e.g. qrcode-print.png
+            output_format = "png"
+        if output_format == "png":
+            filetypes = [("PNG files", "*.png"), ("All files", "*.*")]
+        else:
+            filetypes = [("SVG files", "*.svg"), ("All files", "*.*")]
+        return filedialog.asksaveasfilename(
+            defaultextension=f".{output_format}",
+            filetypes=filetypes,
+            initialfile=f"qrcode.{output_format}"
+        )
+
+    def _generation_job(self, url, output_format, logo_path, file_path, cancel_event):
+        """
+        Encodes, renders and saves the QR code on the worker thread.
+
+        Must not touch any Tk widget; progress goes through _job_stages.
+        Returns None if cancelled, otherwise the logo warning (or '').
+        """
+        timer = metrics.Timer()
+        self._job_stages.put(JOB_STAGES["encode"])
+        warning = ""
+        try:
+            qr = engine.make_qr(url, ERROR_CORRECTION, logo_path=logo_path)
+        except engine.LogoError as e:
+            warning, logo_path = str(e), None  # Save the code without the logo instead
+            qr = engine.make_qr(url, ERROR_CORRECTION)
+        self._last_code = f"version {qr.version}, ECC {qr.error_correction}"
+        timer.mark("encode")
+        if cancel_event.is_set():
+            return None
+
+        if output_format == "all":
+            renditions = [rendition._replace(output=engine.rendition_path(file_path, name,
+                                                                          rendition.output_format))
+                          for name, rendition in engine.STANDARD_RENDITIONS.items()]
+        else:
+            renditions = [engine.Rendition(output_format, qr.box_size, output=file_path)]
 
+        # Every rendition is drawn from the same encoded matrix
+        options = dict(qr=qr, progress=lambda stage: self._job_stages.put(JOB_STAGES[stage]),
+                       cancelled=cancel_event.is_set, timer=timer)
         try:
-            # High error correction is needed for embedding a logo
-            qr = qrcode.QRCode(
-                version=None,
-                error_correction=qrcode.constants.ERROR_CORRECT_H,
-                box_size=12,
-                border=4,
-            )
-            qr.add_data(url)
-            qr.make(fit=True)
-
-            if output_format == "PNG (Digital)":
-                self._save_png(qr, logo_path)
-            elif output_format == "SVG (Print)":
-                self._save_svg(qr)
+            saved = engine.generate_renditions(url, renditions, logo_path, **options)
+        except engine.LogoError as e:
+            warning = str(e)
+            saved = engine.generate_renditions(url, renditions, None, **options)
+        if saved is None:
+            return None
+        self._last_saved = ", ".join(os.path.basename(path) for path in saved)
+        self._last_timings = timer.summary()
+        return warning
+
+    def _poll_generation(self):
+        """Runs on the UI thread until the current job finishes."""
+        future, cancel_event, file_path = self._job
+        while not self._job_stages.empty():
+            stage = self._job_stages.get_nowait()
+            if not cancel_event.is_set():
+                self.status_var.set(stage)
+
+        if not future.done():
+            self.after(POLL_INTERVAL_MS, self._poll_generation)
+            return
 
+        self._job = None
+        self._set_busy(False)
+        try:
+            warning = future.result()
         except Exception as e:
             messagebox.showerror("Generation Failed", f"An unexpected error occurred:\n{e}")
             self.status_var.set(f"Error: {e}")
-
-    def _save_png(self, qr_instance, logo_path):
-        """Creates and saves the QR code as a PNG file."""
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".png",
-            filetypes=[("PNG files", "*.png"), ("All files", "*.*")],
-            initialfile="qrcode.png"
-        )
-        if not file_path:
-            self.status_var.set("Save operation cancelled.")
-            return
-
-        img = qr_instance.make_image(fill_color="black", back_color="white").convert('RGBA')
-
-        if logo_path:
-            try:
-                logo = Image.open(logo_path)
-                # Calculate logo size to be ~20-25% of the QR code
-                qr_width, _ = img.size
-                logo_max_size = int(qr_width / 4)
-                logo.thumbnail((logo_max_size, logo_max_size))
-                
-                # Paste logo in the center
-                pos = ((img.size[0] - logo.size[0]) // 2, (img.size[1] - logo.size[1]) // 2)
-                img.paste(logo, pos, logo if logo.mode == 'RGBA' else None)
-            except Exception as e:
-                self.status_var.set(f"Warning: Could not add logo. {e}")
-        
-        img.save(file_path)
-        self.status_var.set(f"Success! Saved as {os.path.basename(file_path)}")
-
-    def _save_svg(self, qr_instance):
-        """Creates and saves the QR code as an SVG file."""
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".svg",
-            filetypes=[("SVG files", "*.svg"), ("All files", "*.*")],
-            initialfile="qrcode.svg"
-        )
-        if not file_path:
-            self.status_var.set("Save operation cancelled.")
             return
 
-        img = qr_instance.make_image(image_factory=qrcode.image.svg.SvgPathImage)
-        img.save(file_path)
-        self.status_var.set(f"Success! Saved as {os.path.basename(file_path)}")
+        if warning is None:
+            self.status_var.set("Generation cancelled.")
+        else:
+            if warning:
+                message = f"Warning: {warning} Saved as {self._last_saved} ({self._last_code})"
+            else:
+                message = f"Success! Saved as {self._last_saved} ({self._last_code})"
+            if SHOW_TIMINGS:
+                message += f" ({self._last_timings})"
+            self.status_var.set(message)
+
+    def _cancel_generation(self):
+        """Asks the running job to stop at the next stage boundary."""
+        if self._job is not None:
+            self._job[1].set()
+            self.status_var.set("Cancelling...")
+
+    def _set_busy(self, busy):
+        """Swaps the Generate button for the progress bar while a job runs."""
+        if busy:
+            self.generate_button.grid_remove()
+            self.progress_frame.grid()
+            self.progress_bar.start(10)
+        else:
+            self.progress_bar.stop()
+            self.progress_frame.grid_remove()
+            self.generate_button.grid()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,170 @@
+# Per-stage generation benchmark
+#
+# Times each step of the generation path on its own, over a grid of
+# payload sizes, ECC levels, box sizes and logo sizes:
+#
+#   fit      segmentation and version fitting (qrg.segments.fit)
+#   matrix   matrix build incl. Reed-Solomon and mask selection (qrg.matrix.build)
+#   raster   module matrix -> L image (qrg.raster, preview path only)
+#   logo     logo lookup (warm logo cache)
+#   png      streaming PNG encode incl. logo compositing (qrg.raster.write_png)
+#   svg      SVG serialize (qrg.svg)
+#
+# Usage:
+#   python benchmarks/stages.py --quick
+#   python benchmarks/stages.py --ecc H --box-size 12 --repeat 5 -o bench.json
+#   python benchmarks/stages.py --isolate   # fresh process per case, exact peak RSS
+#
+# Writes JSON: one record per case with mean milliseconds per stage,
+# pipeline codes/sec and peak RSS.
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from multiprocessing import get_context
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import qrcode  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from qrg import engine, logos, raster, svg  # noqa: E402
+from qrg import matrix as qr_matrix  # noqa: E402
+from qrg import segments  # noqa: E402
+
+# Byte-mode capacity of a version 40 code per ECC level
+MAX_PAYLOAD = {"L": 2953, "M": 2331, "Q": 1663, "H": 1273}
+
+PAYLOADS = {
+    "short_url": "https://intercuba.net",
+    "tracking_url": "https://intercuba.net/p/000123456789?utm_source=QR&utm_campaign=SPRING2026",
+    "text_500": "InterCuba.Net QR " * 30,
+    "max_v40": None,  # Filled per ECC level from MAX_PAYLOAD
+}
+ECC_LEVELS = ("L", "M", "Q", "H")
+BOX_SIZES = (4, 12, 24)
+LOGO_SIZES = (0, 128, 1024)  # Source logo edge in pixels; 0 = no logo
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS reports bytes
+
+
+def _make_logo(size, directory):
+    path = os.path.join(directory, f"logo_{size}.png")
+    if not os.path.exists(path):
+        Image.new("RGBA", (size, size), (0, 122, 255, 200)).save(path)
+    return path
+
+
+def run_case(case, repeat, logo_dir):
+    """Times every stage of one grid point, `repeat` times, and averages."""
+    payload = PAYLOADS[case["payload"]] or "a" * MAX_PAYLOAD[case["ecc"]]
+    level = engine.ERROR_CORRECTION_LEVELS[case["ecc"]]
+    logo_path = _make_logo(case["logo"], logo_dir) if case["logo"] else None
+    totals = dict.fromkeys(("fit", "matrix", "raster", "logo", "png", "svg"), 0.0)
+    version = None
+    png_bytes = svg_bytes = 0
+
+    for _ in range(repeat):
+        (data_list, version), t = _timed(segments.fit, payload, level)
+        totals["fit"] += t
+        (modules, _), t = _timed(qr_matrix.build, data_list, version, level)
+        totals["matrix"] += t
+
+        encoded = engine.EncodedQR(modules, version, case["ecc"], case["box_size"])
+        matrix = encoded.get_matrix()
+        _, t = _timed(raster.render_matrix, matrix, case["box_size"], "L")
+        totals["raster"] += t
+
+        logo = None
+        if logo_path:
+            width = len(matrix) * case["box_size"]
+            logos.default_cache.get(logo_path, int(width / engine.LOGO_SCALE))  # Warm the logo cache
+            logo, t = _timed(logos.default_cache.get, logo_path, int(width / engine.LOGO_SCALE))
+            totals["logo"] += t
+
+        buffer = BytesIO()
+        _, t = _timed(raster.write_png, matrix, buffer, case["box_size"], "black", "white", logo)
+        totals["png"] += t
+        png_bytes = buffer.tell()
+
+        buffer = BytesIO()
+        _, t = _timed(svg.write_svg, matrix, buffer, case["box_size"])
+        totals["svg"] += t
+        svg_bytes = buffer.tell()
+
+    ms = {stage: total / repeat * 1000 for stage, total in totals.items()}
+    png_ms = ms["fit"] + ms["matrix"] + ms["logo"] + ms["png"]
+    svg_ms = ms["fit"] + ms["matrix"] + ms["svg"]
+    return dict(case, version=version, payload_length=len(payload), stage_ms=ms,
+                png_codes_per_sec=1000 / png_ms, svg_codes_per_sec=1000 / svg_ms,
+                png_bytes=png_bytes, svg_bytes=svg_bytes, peak_rss_kb=_peak_rss_kb(),
+                logo_cache=logos.default_cache.stats())
+
+
+def build_grid(args):
+    return [dict(payload=p, ecc=e, box_size=b, logo=l)
+            for p in args.payload for e in args.ecc for b in args.box_size for l in args.logo]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each QR generation stage.")
+    parser.add_argument("--payload", nargs="+", choices=sorted(PAYLOADS), default=list(PAYLOADS))
+    parser.add_argument("--ecc", nargs="+", choices=ECC_LEVELS, default=list(ECC_LEVELS))
+    parser.add_argument("--box-size", nargs="+", type=int, default=list(BOX_SIZES))
+    parser.add_argument("--logo", nargs="+", type=int, default=list(LOGO_SIZES),
+                        help="source logo sizes in pixels, 0 for no logo")
+    parser.add_argument("--repeat", type=int, default=3, help="runs averaged per case")
+    parser.add_argument("--quick", action="store_true", help="small grid for a fast smoke run")
+    parser.add_argument("--isolate", action="store_true",
+                        help="run each case in a fresh process so peak RSS is per case")
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.payload, args.ecc, args.box_size, args.logo = ["short_url", "max_v40"], ["H"], [12], [0, 128]
+
+    results = []
+    with tempfile.TemporaryDirectory() as logo_dir:
+        for case in build_grid(args):
+            if args.isolate:
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                    result = pool.submit(run_case, case, args.repeat, logo_dir).result()
+            else:
+                result = run_case(case, args.repeat, logo_dir)
+            results.append(result)
+            print(f"{case} -> v{result['version']}, {result['png_codes_per_sec']:.1f} png/s, "
+                  f"{result['svg_codes_per_sec']:.1f} svg/s", file=sys.stderr)
+
+    report = {
+        "python": sys.version.split()[0],
+        "qrcode": getattr(qrcode, "__version__", None),
+        "repeat": args.repeat,
+        "isolated": args.isolate,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# Startup benchmark for the desktop app
+#
+# Measures, in fresh interpreters:
+#   - module import time of the entry point (from python -X importtime)
+#   - time to first frame (window built and drawn), when a display exists
+#   - total process wall time
+#
+# Usage:
+#   python benchmarks/startup.py                       # QR-G.py, 5 runs
+#   python benchmarks/startup.py --app QR-G_Debian.py --runs 10
+#   python benchmarks/startup.py --max-import-ms 150   # regression gate
+#
+# Prints a JSON report and exits with status 1 when a limit is exceeded.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter
+CHILD = r"""
+import importlib.util, json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, os.path.dirname(APP))
+spec = importlib.util.spec_from_file_location("qrg_app", APP)
+app_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(app_module)
+imported = time.perf_counter()
+
+first_frame = None
+try:
+    app = app_module.QRCodeApp()
+    app.update()
+    first_frame = time.perf_counter()
+    app.destroy()
+except Exception as e:  # Typically no display available
+    print(f"first frame skipped: {e}", file=sys.stderr)
+
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_frame_ms": None if first_frame is None else (first_frame - start) * 1000,
+    "heavy_modules": sorted(m for m in ("qrcode", "PIL.Image", "numpy", "requests") if m in sys.modules),
+}))
+"""
+
+
+def parse_importtime(stderr, top=10):
+    """Returns the slowest modules by self time from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(self_us), int(cumulative_us), name))
+    rows.sort(reverse=True)
+    return [{"module": name.strip(), "self_ms": s / 1000, "cumulative_ms": c / 1000}
+            for s, c, name in rows[:top]]
+
+
+def run_once(app):
+    code = f"APP = {app!r}\n" + CHILD
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, cwd=REPO_ROOT)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["wall_ms"] = wall_ms
+    result["slowest_imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def _median(values):
+    values = [v for v in values if v is not None]
+    return statistics.median(values) if values else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure QR-G startup time.")
+    parser.add_argument("--app", default="QR-G.py", help="entry point to measure (default: %(default)s)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import time is higher")
+    parser.add_argument("--max-first-frame-ms", type=float, help="fail if the median time to first frame is higher")
+    args = parser.parse_args(argv)
+
+    app = os.path.join(REPO_ROOT, args.app)
+    runs = [run_once(app) for _ in range(args.runs)]
+    report = {
+        "app": args.app,
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "import_ms": _median(r["import_ms"] for r in runs),
+        "first_frame_ms": _median(r["first_frame_ms"] for r in runs),
+        "wall_ms": _median(r["wall_ms"] for r in runs),
+        "heavy_modules_at_startup": runs[-1]["heavy_modules"],
+        "slowest_imports": runs[-1]["slowest_imports"],
+    }
+    print(json.dumps(report, indent=2))
+
+    failed = False
+    if args.max_import_ms is not None and report["import_ms"] > args.max_import_ms:
+        print(f"FAIL: import {report['import_ms']:.1f}ms > {args.max_import_ms}ms", file=sys.stderr)
+        failed = True
+    if args.max_first_frame_ms is not None:
+        if report["first_frame_ms"] is None:
+            print("FAIL: first frame could not be measured (no display?)", file=sys.stderr)
+            failed = True
+        elif report["first_frame_ms"] > args.max_first_frame_ms:
+            print(f"FAIL: first frame {report['first_frame_ms']:.1f}ms > {args.max_first_frame_ms}ms",
+                  file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+# QR-G generation package
+#
+# GUI-free building blocks shared by QR-G.py and QR-G_Debian.py.
+# Nothing in here imports tkinter, so it can run on headless machines.
+#
+# The engine is only imported when one of its names is first used, so
+# importing qrg (or qrg.lazy) from the GUI costs nothing at startup.
+
+_ENGINE_EXPORTS = (
+    "DEFAULT_BORDER",
+    "DEFAULT_BOX_SIZE",
+    "DEFAULT_ERROR_CORRECTION",
+    "GenerationError",
+    "LogoError",
+    "Rendition",
+    "generate",
+    "generate_renditions",
+    "make_qr",
+    "render_png",
+    "render_svg",
+)
+
+__all__ = list(_ENGINE_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _ENGINE_EXPORTS:
+        from . import engine
+        return getattr(engine, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
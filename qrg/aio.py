@@ -0,0 +1,79 @@
+# Asyncio generation API
+#
+#   async with AsyncGenerator(max_concurrency=8) as gen:
+#       buffers = await gen.generate_many([{"content": url} for url in urls])
+#
+# Encoding and rendering are CPU-bound, so they run in an executor and
+# never block the event loop. A semaphore bounds how many renders are
+# submitted at once, which keeps memory flat when gathering large batches.
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from . import engine
+
+
+class AsyncGenerator:
+    """
+    Runs engine.generate() in an executor with a concurrency limit.
+
+    By default a process pool with max_concurrency workers is used, so
+    renders scale across cores; pass any concurrent.futures executor to
+    share an existing pool instead (it is then not shut down by close()).
+    """
+
+    def __init__(self, max_concurrency=None, executor=None):
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self._owns_executor = executor is None
+        self._executor = executor
+        self._semaphore = None  # Created on first use, inside the running loop
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_concurrency)
+        return self._executor
+
+    async def generate(self, content, output_format="png", logo_path=None, **options):
+        """
+        Generates one QR code and returns it as a BytesIO positioned at 0.
+
+        Accepts the same render options as engine.generate (error_correction,
+        box_size, border); nothing is written to the filesystem.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        call = functools.partial(engine.generate, content, output_format, logo_path, **options)
+        async with self._semaphore:
+            data = await asyncio.get_running_loop().run_in_executor(self._get_executor(), call)
+        return BytesIO(data)
+
+    async def generate_many(self, requests, return_exceptions=False):
+        """
+        Generates a batch concurrently; results keep the order of requests.
+
+        Each request is a dict of generate() keyword arguments. With
+        return_exceptions, failures are returned in place instead of raised.
+        """
+        return await asyncio.gather(*(self.generate(**request) for request in requests),
+                                    return_exceptions=return_exceptions)
+
+    async def close(self):
+        if self._owns_executor and self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+
+async def generate(content, output_format="png", logo_path=None, **options):
+    """One-off async generation on the loop's default thread pool (no process pool)."""
+    call = functools.partial(engine.generate, content, output_format, logo_path, **options)
+    data = await asyncio.get_running_loop().run_in_executor(None, call)
+    return BytesIO(data)
@@ -0,0 +1,266 @@
+# Packed archive output
+#
+# Saving one file per code turns a large batch into millions of creates
+# and stats on the filesystem's metadata path. An archive appends every
+# rendered code to a single uncompressed ZIP instead (PNGs are already
+# deflated, SVGs are tiny), which any zip tool can still open, and
+# ArchiveReader serves members by name straight from a memory map.
+
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+
+ARCHIVE_EXTENSIONS = (".zip",)
+
+# --- ZIP records (stored members only, zip64 once the archive outgrows 4 GB / 65535 entries) ---
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_RECORD = struct.Struct("<IHHHHIIH")
+ZIP64_END_RECORD = struct.Struct("<IQHHIIQQQQ")
+ZIP64_LOCATOR = struct.Struct("<IIQI")
+ZIP64_OFFSET_EXTRA = struct.Struct("<HHQ")
+
+LOCAL_SIGNATURE = 0x04034b50
+CENTRAL_SIGNATURE = 0x02014b50
+END_SIGNATURE = 0x06054b50
+ZIP64_END_SIGNATURE = 0x06064b50
+ZIP64_LOCATOR_SIGNATURE = 0x07064b50
+ZIP64_EXTRA_ID = 0x0001
+
+VERSION = 20         # 2.0: stored members
+ZIP64_VERSION = 45   # 4.5: zip64 extensions
+MADE_BY_UNIX = 3 << 8
+UTF8_FLAG = 0x0800
+DATA_DESCRIPTOR_FLAG = 0x0008
+STORED = 0
+FILE_ATTRIBUTES = 0o100644 << 16
+MAX_32 = 0xFFFFFFFF
+MAX_16 = 0xFFFF
+MAX_COMMENT = 0xFFFF
+
+
+def is_archive(path):
+    """True if the output path names an archive rather than a directory."""
+    return str(path).lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _dos_time(timestamp):
+    t = time.localtime(timestamp)
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((max(t.tm_year, 1980) - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+class ArchiveWriter:
+    """
+    Appends files to an uncompressed ZIP archive.
+
+    Every member is written as one local header plus its bytes, so a
+    crashed run leaves a readable prefix: with resume, the complete
+    members of an existing archive are kept (their names are in
+    .names) and new ones are appended after them. The central directory
+    is spooled to a temporary file and written at close().
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.names = set()
+        self.count = 0
+        self._dos_time, self._dos_date = _dos_time(time.time())
+        self._central = tempfile.TemporaryFile()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if resume and os.path.exists(path):
+            self._file = open(path, "r+b")
+            self._recover()
+        else:
+            self._file = open(path, "w+b")
+        self.position = self._file.tell()
+
+    def _recover(self):
+        """Indexes the complete members of an existing archive and drops whatever follows them."""
+        f = self._file
+        size = f.seek(0, os.SEEK_END)
+        offset = 0
+        while offset + LOCAL_HEADER.size <= size:
+            f.seek(offset)
+            (signature, _, flags, method, dos_time, dos_date, crc, compressed_size, _,
+             name_length, extra_length) = LOCAL_HEADER.unpack(f.read(LOCAL_HEADER.size))
+            if signature != LOCAL_SIGNATURE:
+                break  # The old central directory (or a torn header)
+            if method != STORED or flags & DATA_DESCRIPTOR_FLAG:
+                raise ValueError(f"{self.path} was not written by ArchiveWriter; cannot append to it")
+            end = offset + LOCAL_HEADER.size + name_length + extra_length + compressed_size
+            if end > size:
+                break  # Interrupted while writing this member
+            name = f.read(name_length)
+            self._index(name, crc, compressed_size, offset, dos_time, dos_date)
+            offset = end
+        f.seek(offset)
+        f.truncate()
+
+    def _index(self, name, crc, size, offset, dos_time, dos_date):
+        extra = b""
+        version = VERSION
+        if offset >= MAX_32:
+            extra = ZIP64_OFFSET_EXTRA.pack(ZIP64_EXTRA_ID, 8, offset)
+            version = ZIP64_VERSION
+            offset = MAX_32
+        self._central.write(CENTRAL_HEADER.pack(
+            CENTRAL_SIGNATURE, MADE_BY_UNIX | ZIP64_VERSION, version, UTF8_FLAG, STORED,
+            dos_time, dos_date, crc, size, size, len(name), len(extra), 0, 0, 0,
+            FILE_ATTRIBUTES, offset))
+        self._central.write(name)
+        self._central.write(extra)
+        self.names.add(name.decode("utf-8"))
+        self.count += 1
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def add(self, name, data):
+        """Appends a member; name uses '/' separators like any ZIP path."""
+        encoded = name.encode("utf-8")
+        size = len(data)
+        if size >= MAX_32:
+            raise ValueError(f"{name} is too large for an archive member")
+        crc = zlib.crc32(data)
+        offset = self.position
+        self._file.write(LOCAL_HEADER.pack(
+            LOCAL_SIGNATURE, VERSION, UTF8_FLAG, STORED, self._dos_time, self._dos_date,
+            crc, size, size, len(encoded), 0))
+        self._file.write(encoded)
+        self._file.write(data)
+        self.position += LOCAL_HEADER.size + len(encoded) + size
+        self._index(encoded, crc, size, offset, self._dos_time, self._dos_date)
+
+    def close(self):
+        """Writes the central directory; the archive is complete afterwards."""
+        if self._file.closed:
+            return
+        directory_offset = self.position
+        directory_size = self._central.tell()
+        self._central.seek(0)
+        shutil.copyfileobj(self._central, self._file)
+        self._central.close()
+        end = directory_offset + directory_size
+        if self.count >= MAX_16 or directory_offset >= MAX_32 or directory_size >= MAX_32:
+            self._file.write(ZIP64_END_RECORD.pack(
+                ZIP64_END_SIGNATURE, ZIP64_END_RECORD.size - 12, MADE_BY_UNIX | ZIP64_VERSION,
+                ZIP64_VERSION, 0, 0, self.count, self.count, directory_size, directory_offset))
+            self._file.write(ZIP64_LOCATOR.pack(ZIP64_LOCATOR_SIGNATURE, 0, end, 1))
+        self._file.write(END_RECORD.pack(
+            END_SIGNATURE, 0, 0, min(self.count, MAX_16), min(self.count, MAX_16),
+            min(directory_size, MAX_32), min(directory_offset, MAX_32), 0))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveReader:
+    """
+    Random access to the members of an uncompressed ZIP through mmap.
+
+    Only the central directory is parsed when opening; get() returns a
+    zero-copy memoryview of a member, so a server can send codes without
+    opening or stat-ing a file per request. Views must be released
+    before close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self._members = {}
+        try:
+            self._read_directory()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_directory(self):
+        data = self._map
+        end = data.rfind(struct.pack("<I", END_SIGNATURE),
+                         max(0, len(data) - END_RECORD.size - MAX_COMMENT))
+        if end < 0:
+            raise ValueError(f"{self.path} is not a ZIP archive")
+        _, _, _, _, count, directory_size, directory_offset, _ = END_RECORD.unpack_from(data, end)
+        locator = end - ZIP64_LOCATOR.size
+        if locator >= 0 and struct.unpack_from("<I", data, locator)[0] == ZIP64_LOCATOR_SIGNATURE:
+            record = ZIP64_LOCATOR.unpack_from(data, locator)[2]
+            fields = ZIP64_END_RECORD.unpack_from(data, record)
+            count, directory_size, directory_offset = fields[7], fields[8], fields[9]
+
+        directory_end = directory_offset + directory_size
+        if directory_end > len(data):
+            raise ValueError(f"{self.path} is truncated")
+        offset = directory_offset
+        for _ in range(count):
+            if offset + CENTRAL_HEADER.size > directory_end:
+                raise ValueError(f"{self.path} has a damaged central directory")
+            fields = CENTRAL_HEADER.unpack_from(data, offset)
+            if fields[0] != CENTRAL_SIGNATURE:
+                raise ValueError(f"{self.path} has a damaged central directory")
+            method, size, name_length, extra_length, comment_length = (
+                fields[4], fields[9], fields[10], fields[11], fields[12])
+            header_offset = fields[16]
+            start = offset + CENTRAL_HEADER.size
+            name = bytes(data[start:start + name_length]).decode("utf-8")
+            if MAX_32 in (size, header_offset):
+                size, header_offset = self._zip64_fields(
+                    data, start + name_length, extra_length, size, fields[8], header_offset)
+            self._members[name] = (header_offset, size, method)
+            offset = start + name_length + extra_length + comment_length
+
+    @staticmethod
+    def _zip64_fields(data, start, length, size, compressed_size, header_offset):
+        """Reads the 64-bit values a zip64 extra field holds for saturated header fields."""
+        end = start + length
+        while start + 4 <= end:
+            tag, field_length = struct.unpack_from("<HH", data, start)
+            if tag == ZIP64_EXTRA_ID:
+                values = iter(struct.unpack_from(f"<{field_length // 8}Q", data, start + 4))
+                if size == MAX_32:
+                    size = next(values)
+                if compressed_size == MAX_32:
+                    next(values)
+                if header_offset == MAX_32:
+                    header_offset = next(values)
+                break
+            start += 4 + field_length
+        return size, header_offset
+
+    def __len__(self):
+        return len(self._members)
+
+    def __contains__(self, name):
+        return name in self._members
+
+    def __iter__(self):
+        return iter(self._members)
+
+    def get(self, name):
+        """Returns the member's bytes as a memoryview into the map; KeyError if missing."""
+        header_offset, size, method = self._members[name]
+        if method != STORED:
+            raise ValueError(f"{name} is compressed; only stored members can be memory-mapped")
+        name_length, extra_length = struct.unpack_from("<HH", self._map, header_offset + 26)
+        start = header_offset + LOCAL_HEADER.size + name_length + extra_length
+        return self._view[start:start + size]
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
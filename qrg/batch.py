@@ -0,0 +1,311 @@
+# Batch generation from CSV / JSONL manifests
+#
+# Manifests are streamed row by row, so a catalog with millions of rows
+# never has to fit in memory. Each row names the content to encode and
+# optionally the output filename, format and logo.
+
+import csv
+import json
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from . import archive, engine
+
+# --- Manifest columns ---
+# 'content' is required; the rest fall back to sensible defaults.
+CONTENT_KEYS = ("content", "url", "data")
+OUTPUT_KEYS = ("output", "filename", "file")
+FORMAT_KEYS = ("format",)
+LOGO_KEYS = ("logo", "logo_path")
+
+PROGRESS_INTERVAL = 1.0  # Seconds between progress reports
+
+# --- Parallel rendering ---
+DEFAULT_CHUNK_SIZE = 64  # Rows sent to a worker per task, to keep IPC overhead low
+CHUNKS_IN_FLIGHT = 4     # Queued chunks per worker; bounds memory on huge manifests
+
+# Per-item outcomes
+DONE, SKIPPED, FAILED = "done", "skipped", "failed"
+
+# error is set (and the rest may be None) when the manifest row itself is invalid
+BatchItem = namedtuple("BatchItem", "index content output output_format logo_path error",
+                       defaults=(None,))
+
+
+class ManifestError(engine.GenerationError):
+    """Raised for a manifest row that cannot be turned into a BatchItem."""
+
+
+class BatchStats:
+    """Running counters for a batch job."""
+
+    def __init__(self):
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+
+    @property
+    def processed(self):
+        return self.done + self.skipped + self.failed
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        """Rendered codes per second (skipped rows are not counted)."""
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"{self.done} generated, {self.skipped} skipped, {self.failed} failed "
+                f"in {self.elapsed:.1f}s ({self.rate:.1f} codes/sec)")
+
+
+def _first(row, keys):
+    for key in keys:
+        value = row.get(key)
+        if value not in (None, ""):
+            return str(value).strip()
+    return None
+
+
+def _check_output(output):
+    """Outputs must stay inside the output directory."""
+    drive, path = os.path.splitdrive(output)
+    if drive or os.path.isabs(path) or ".." in path.replace("\\", "/").split("/"):
+        raise ManifestError(f"Output must be a relative path inside the output directory: {output}")
+
+
+def _make_item(index, row, default_format):
+    if isinstance(row, Exception):
+        raise row
+    content = _first(row, CONTENT_KEYS)
+    output = _first(row, OUTPUT_KEYS)
+    if output is not None:
+        _check_output(output)
+    output_format = _first(row, FORMAT_KEYS)
+    if output_format is None:
+        ext = os.path.splitext(output)[1] if output else ""
+        output_format = ext or default_format
+    output_format = engine.normalize_format(output_format)
+    if output is None:
+        output = f"qrcode_{index:06d}.{output_format}"
+    return BatchItem(index, content, output, output_format, _first(row, LOGO_KEYS))
+
+
+def _jsonl_rows(f):
+    """Yields each JSON object, or a ManifestError in place of a line that is not one."""
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield ManifestError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(row, dict):
+            yield ManifestError("Expected a JSON object")
+            continue
+        yield row
+
+
+def read_manifest(path, default_format="png"):
+    """
+    Yields BatchItems from a .csv or .jsonl manifest, one row at a time.
+
+    An invalid row does not stop the manifest: it is yielded with its
+    error set, and run_batch reports it through on_error.
+    """
+    is_jsonl = os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson", ".json")
+    with open(path, newline="", encoding="utf-8-sig") as f: # Spreadsheet exports often start with a BOM
+        rows = _jsonl_rows(f) if is_jsonl else csv.DictReader(f)
+        for index, row in enumerate(rows):
+            try:
+                yield _make_item(index, row, default_format)
+            except engine.GenerationError as e:
+                output = _first(row, OUTPUT_KEYS) if isinstance(row, dict) else None
+                yield BatchItem(index, None, output, None, None, e)
+
+
+def item_paths(item, output_dir, renditions=None):
+    """
+    Output paths of one manifest row.
+
+    With renditions (a dict of name -> engine.Rendition) every rendition
+    is written next to the row's output as <stem>-<name>.<format>.
+    """
+    path = os.path.join(output_dir, item.output)
+    if not renditions:
+        return [path]
+    return [engine.rendition_path(path, name, engine.normalize_format(rendition.output_format))
+            for name, rendition in renditions.items()]
+
+
+def generate_item(item, output_dir, renditions=None, **options):
+    """Renders one manifest row, writing atomically into output_dir."""
+    paths = item_paths(item, output_dir, renditions)
+    os.makedirs(os.path.dirname(paths[0]) or ".", exist_ok=True)
+    # The engine writes each path through a temporary name, so an
+    # interrupted run never leaves a truncated file that a resumed run
+    # would mistake for a finished one.
+    if not renditions:
+        engine.generate(item.content, item.output_format, item.logo_path,
+                        output=paths[0], **options)
+    else:
+        options.pop("box_size", None)
+        specs = [rendition._replace(output=path)
+                 for rendition, path in zip(renditions.values(), paths)]
+        engine.generate_renditions(item.content, specs, item.logo_path, **options)
+    return paths[0]
+
+
+def item_names(item, renditions=None):
+    """Archive member names of one manifest row ('/'-separated item_paths)."""
+    return [path.replace(os.sep, "/") for path in item_paths(item, "", renditions)]
+
+
+def pack_item(item, renditions=None, **options):
+    """Renders one manifest row in memory, returning [(archive name, bytes)]."""
+    names = item_names(item, renditions)
+    if not renditions:
+        return [(names[0], engine.generate(item.content, item.output_format, item.logo_path,
+                                           **options))]
+    options.pop("box_size", None)
+    data = engine.generate_renditions(item.content, list(renditions.values()), item.logo_path,
+                                      **options)
+    return list(zip(names, data))
+
+
+def process_item(item, output_dir, resume, options):
+    """
+    Renders one item and returns (status, exception or None, packed).
+
+    With output_dir None nothing is written: packed is the
+    [(name, bytes)] list for the archive. Otherwise it is None.
+    """
+    if item.error is not None:
+        return FAILED, item.error, None
+    if output_dir is None:
+        try:
+            return DONE, None, pack_item(item, **options)
+        except Exception as e:
+            return FAILED, e, None
+    paths = item_paths(item, output_dir, options.get("renditions"))
+    if resume and all(os.path.exists(path) for path in paths):
+        return SKIPPED, None, None
+    try:
+        generate_item(item, output_dir, **options)
+        return DONE, None, None
+    except Exception as e:
+        return FAILED, e, None
+
+
+def _process_chunk(chunk, output_dir, resume, options):
+    """Worker entry point: renders a list of items in a pool process."""
+    results = []
+    for item in chunk:
+        status, error, packed = process_item(item, output_dir, resume, options)
+        if error is not None and not isinstance(error, engine.GenerationError):
+            # Not every exception pickles cleanly back to the parent
+            error = engine.GenerationError(f"{type(error).__name__}: {error}")
+        results.append((status, error, packed))
+    return results
+
+
+def _chunks(items, size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _iter_parallel(items, output_dir, resume, options, workers, chunk_size):
+    """Yields (item, status, error, packed) in manifest order from a process pool."""
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in _chunks(items, chunk_size):
+            pending.append((chunk, pool.submit(_process_chunk, chunk, output_dir, resume, options)))
+            # Only read ahead a bounded number of chunks, and always hand
+            # back the oldest one first so the output order is deterministic.
+            while len(pending) >= workers * CHUNKS_IN_FLIGHT:
+                chunk_done, future = pending.popleft()
+                yield from zip(chunk_done, *zip(*future.result()))
+        while pending:
+            chunk_done, future = pending.popleft()
+            yield from zip(chunk_done, *zip(*future.result()))
+
+
+def _unpacked(items, writer, renditions, stats):
+    """Passes on the items whose files are not all in the archive yet."""
+    for item in items:
+        if item.error is None and all(name in writer for name in item_names(item, renditions)):
+            stats.skipped += 1
+        else:
+            yield item
+
+
+def run_batch(items, output_dir, resume=True, progress=None, on_error=None,
+              workers=1, chunk_size=DEFAULT_CHUNK_SIZE, **options):
+    """
+    Generates every item into output_dir and returns the BatchStats.
+
+    With resume enabled, items whose output already exists are skipped.
+    Passing renditions (see item_paths) writes several sizes and formats
+    of every row from a single encode. If output_dir is a .zip path the
+    files are packed into that one archive instead (see qrg.archive),
+    named by their paths relative to it.
+    progress(stats) is called about once per PROGRESS_INTERVAL and
+    on_error(item, exc) for every row that fails, in manifest order.
+    With workers > 1 rendering is spread over a process pool, handing out
+    chunk_size rows at a time; workers=0 uses every CPU core.
+    """
+    stats = BatchStats()
+    last_report = stats.started
+    writer = None
+    if archive.is_archive(output_dir):
+        # Workers render in memory; only this process appends to the archive
+        writer = archive.ArchiveWriter(output_dir, resume=resume)
+        if resume:
+            items = _unpacked(items, writer, options.get("renditions"), stats)
+        output_dir = None
+    else:
+        os.makedirs(output_dir, exist_ok=True)
+
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers > 1:
+        results = _iter_parallel(items, output_dir, resume, options, workers, chunk_size)
+    else:
+        results = ((item, *process_item(item, output_dir, resume, options)) for item in items)
+
+    try:
+        for item, status, error, packed in results:
+            if status == DONE:
+                stats.done += 1
+                for name, data in packed or ():
+                    writer.add(name, data)
+            elif status == SKIPPED:
+                stats.skipped += 1
+            else:
+                stats.failed += 1
+                if on_error:
+                    on_error(item, error)
+
+            if progress and time.perf_counter() - last_report >= PROGRESS_INTERVAL:
+                last_report = time.perf_counter()
+                progress(stats)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if progress:
+        progress(stats)
+    return stats
@@ -0,0 +1,174 @@
+# Content-addressed render cache
+#
+# Identical requests (same payload, format and render options) always
+# produce identical files, so finished renders are stored on disk under
+# a hash of their inputs. A hit is served by hard-linking (or copying)
+# the stored artifact instead of encoding and rendering again.
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # Size cap before old entries are evicted
+CACHE_VERSION = 5  # Bump when renderer output changes, to invalidate old entries
+
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def _file_digest(path):
+    """sha256 of a file, remembered per (path, mtime, size)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _digests_lock:
+        digest = _digests.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        digest = h.hexdigest()
+        with _digests_lock:
+            _digests[memo_key] = digest
+    return digest
+
+
+def cache_key(content, output_format, logo_path=None, **options):
+    """Hashes everything that affects the rendered bytes."""
+    spec = {
+        "v": CACHE_VERSION,
+        "content": content,
+        "format": output_format,
+        "logo": _file_digest(logo_path) if logo_path else None,
+        "options": options,
+    }
+    blob = json.dumps(spec, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """
+    On-disk cache of rendered QR files, addressed by cache_key().
+
+    Entries are evicted least-recently-used first once the total size
+    exceeds max_bytes. Served files may be hard links to the cache, so
+    callers should replace rather than edit them in place.
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES, link=True):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # Lazily computed on first store
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key, output_format):
+        return os.path.join(self.root, key[:2], f"{key}.{output_format}")
+
+    def fetch(self, key, output_format, output):
+        """Places the cached artifact at output. Returns False on a miss."""
+        src = self._path(key, output_format)
+        tmp = f"{output}.{uuid.uuid4().hex}.tmp"
+        try:
+            self._place(src, tmp)
+            os.replace(tmp, output)  # output is left alone on a miss
+            os.utime(src)  # Mark as recently used
+        except FileNotFoundError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def _place(self, src, dest):
+        """Hard-links src to dest, or copies it when link=False or linking fails."""
+        if self.link:
+            try:
+                os.link(src, dest)
+                return
+            except FileNotFoundError:
+                raise
+            except OSError:
+                pass  # Cross-device or no link support
+        shutil.copyfile(src, dest)
+
+    def read(self, key, output_format):
+        """Returns the cached bytes, or None on a miss."""
+        src = self._path(key, output_format)
+        try:
+            with open(src, 'rb') as f:
+                data = f.read()
+            os.utime(src)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def store(self, key, output_format, source=None, data=None):
+        """Adds a rendered file (by path) or its bytes to the cache."""
+        dest = self._path(key, output_format)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+        if data is not None:
+            with open(tmp, 'wb') as f:
+                f.write(data)
+        else:
+            self._place(source, tmp)
+        os.replace(tmp, dest)
+
+        if self._size is None:
+            self._size = self.stats()["bytes"]
+        else:
+            self._size += os.path.getsize(dest)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue  # Evicted by another process
+                yield path, st
+
+    def evict(self, max_bytes=None):
+        """Deletes least recently used entries until under max_bytes."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries(), key=lambda e: e[1].st_mtime)
+        total = sum(st.st_size for _, st in entries)
+        removed = 0
+        for path, st in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= st.st_size
+            removed += 1
+        self._size = total
+        return removed
+
+    def clear(self):
+        return self.evict(max_bytes=0)
+
+    def stats(self):
+        """Returns entry count, total bytes and this process's hit counters."""
+        count = total = 0
+        for _, st in self._entries():
+            count += 1
+            total += st.st_size
+        return {"root": self.root, "entries": count, "bytes": total,
+                "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
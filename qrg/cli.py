@@ -0,0 +1,222 @@
+# Command-line interface for headless QR generation
+#
+#   python QR-G.py batch manifest.csv -o out/
+#   python -m qrg batch manifest.jsonl -o out/ --no-resume
+#   python -m qrg batch manifest.csv -o codes.zip -j 0
+#   python -m qrg batch manifest.csv -o out/ --rendition web --rendition print --rendition svg
+#   python -m qrg sheet manifest.csv -o labels.pdf --columns 5 --rows 8
+
+import argparse
+import json
+import os
+import sys
+
+from . import batch, engine, sheet
+from .cache import RenderCache
+
+
+def _add_render_options(parser):
+    parser.add_argument("--ecc", default=engine.DEFAULT_ERROR_CORRECTION,
+                        choices=sorted(engine.ERROR_CORRECTION_LEVELS) + [engine.AUTO],
+                        help="error correction level, or 'auto' to fit it to the logo "
+                             "(default: %(default)s)")
+    parser.add_argument("--box-size", type=int, default=engine.DEFAULT_BOX_SIZE,
+                        help="pixels per module (default: %(default)s)")
+    parser.add_argument("--border", type=int, default=engine.DEFAULT_BORDER,
+                        help="quiet zone in modules (default: %(default)s)")
+
+
+def _parse_rendition(text):
+    """'print', or 'name=format[:box_size[:fill[:back]]]' such as 'badge=png:16:navy:white'."""
+    name, sep, spec = text.partition("=")
+    if not sep:
+        if name not in engine.STANDARD_RENDITIONS:
+            raise argparse.ArgumentTypeError(
+                f"unknown rendition '{name}' (choose from {', '.join(engine.STANDARD_RENDITIONS)} "
+                f"or give name=format[:box_size[:fill[:back]]])")
+        return name, engine.STANDARD_RENDITIONS[name]
+    parts = spec.split(":")
+    if not name or len(parts) > 4:
+        raise argparse.ArgumentTypeError(f"invalid rendition '{text}'")
+    try:
+        output_format = engine.normalize_format(parts[0])
+        box_size = int(parts[1]) if len(parts) > 1 and parts[1] else engine.DEFAULT_BOX_SIZE
+        colors = engine.resolve_colors(output_format, *[part or None for part in parts[2:]])
+    except (ValueError, engine.GenerationError) as e:
+        raise argparse.ArgumentTypeError(f"invalid rendition '{text}': {e}")
+    return name, engine.Rendition(output_format, box_size, *colors)
+
+
+def _render_options(args):
+    return dict(error_correction=args.ecc, box_size=args.box_size, border=args.border)
+
+
+def _add_cache_options(parser, required=False):
+    parser.add_argument("--cache-dir", required=required,
+                        help="content-addressed render cache directory")
+    parser.add_argument("--cache-max-mb", type=float, default=1024,
+                        help="evict old cache entries above this size (default: %(default)s)")
+
+
+def _open_cache(args):
+    if not args.cache_dir:
+        return None
+    return RenderCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024))
+
+
+def _cmd_batch(args):
+    def report(stats):
+        if not args.quiet:
+            print(stats, file=sys.stderr)
+
+    def report_error(item, exc):
+        print(f"Row {item.index} ({item.output}) failed: {exc}", file=sys.stderr)
+
+    options = _render_options(args)
+    if args.rendition:
+        options["renditions"] = dict(args.rendition)
+    items = batch.read_manifest(args.manifest, default_format=args.format)
+    stats = batch.run_batch(items, args.output_dir, resume=not args.no_resume,
+                            progress=report, on_error=report_error,
+                            workers=args.workers, chunk_size=args.chunk_size,
+                            cache=_open_cache(args), **options)
+    return 1 if stats.failed else 0
+
+
+def _cmd_sheet(args):
+    def report(stats):
+        if not args.quiet:
+            print(stats, file=sys.stderr)
+
+    def report_error(item, exc):
+        print(f"Row {item.index} failed: {exc}", file=sys.stderr)
+
+    try:
+        layout = sheet.SheetLayout(args.page, args.dpi, args.columns, args.rows,
+                                   args.margin_mm, args.gap_mm, args.caption,
+                                   args.caption_mm, args.landscape)
+    except engine.GenerationError as e:
+        print(e, file=sys.stderr)
+        return 2
+    items = batch.read_manifest(args.manifest)
+    stats = sheet.render_sheets(items, args.output, layout, mode="RGB" if args.color else "L",
+                                progress=report, on_error=report_error,
+                                error_correction=args.ecc, border=args.border)
+    return 1 if stats.failed else 0
+
+
+def _cmd_cache(args):
+    cache = _open_cache(args)
+    if args.action == "evict":
+        print(f"Evicted {cache.evict()} entries.")
+    elif args.action == "clear":
+        print(f"Removed {cache.clear()} entries.")
+    stats = cache.stats()
+    # Hit counters live in each process that used the cache, not on disk
+    del stats["hits"], stats["misses"]
+    print(json.dumps(stats, indent=2))
+    return 0
+
+
+def _cmd_serve(args):
+    from .server import serve
+
+    serve(args.host, args.port, workers=args.workers, queue_size=args.queue_size,
+          cache_bytes=int(args.cache_mb * 1024 * 1024), logo_dir=args.logo_dir,
+          max_age=args.max_age)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="QR-G", description="InterCuba.Net QR Code Generator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("batch", help="render every row of a CSV or JSONL manifest")
+    p.add_argument("manifest", help="CSV or JSONL file with a 'content' column")
+    p.add_argument("-o", "--output-dir", required=True,
+                   help="directory for the generated files, or a .zip archive to pack them into")
+    p.add_argument("--format", default="png", choices=engine.FORMATS,
+                   help="format for rows that do not specify one (default: %(default)s)")
+    p.add_argument("--no-resume", action="store_true",
+                   help="regenerate outputs that already exist")
+    p.add_argument("-q", "--quiet", action="store_true", help="do not report progress")
+    p.add_argument("-j", "--workers", type=int, default=1,
+                   help="render with this many processes, 0 for one per CPU core (default: %(default)s)")
+    p.add_argument("--chunk-size", type=int, default=batch.DEFAULT_CHUNK_SIZE,
+                   help="rows handed to a worker at a time (default: %(default)s)")
+    p.add_argument("--rendition", action="append", type=_parse_rendition,
+                   help="write <stem>-NAME.<format> for every row, all from one encode; "
+                        "a preset (web, print, svg) or NAME=FORMAT[:BOX_SIZE[:FILL[:BACK]]], "
+                        "repeatable (overrides --format and --box-size)")
+    _add_render_options(p)
+    _add_cache_options(p)
+    p.set_defaults(func=_cmd_batch)
+
+    p = commands.add_parser("sheet", help="tile the codes of a manifest onto printable pages")
+    p.add_argument("manifest", help="CSV or JSONL file with a 'content' column")
+    p.add_argument("-o", "--output", required=True,
+                   help="labels.pdf (one multi-page file), or labels.png / labels.svg (one file per page)")
+    p.add_argument("--page", default="a4", choices=sorted(sheet.PAGE_SIZES),
+                   help="paper size (default: %(default)s)")
+    p.add_argument("--landscape", action="store_true", help="rotate the page")
+    p.add_argument("--dpi", type=int, default=sheet.DEFAULT_DPI,
+                   help="resolution of PNG and PDF pages (default: %(default)s)")
+    p.add_argument("--columns", type=int, default=sheet.DEFAULT_COLUMNS,
+                   help="codes per row (default: %(default)s)")
+    p.add_argument("--rows", type=int, default=sheet.DEFAULT_ROWS,
+                   help="rows per page (default: %(default)s)")
+    p.add_argument("--margin-mm", type=float, default=sheet.DEFAULT_MARGIN_MM,
+                   help="page margin (default: %(default)s)")
+    p.add_argument("--gap-mm", type=float, default=sheet.DEFAULT_GAP_MM,
+                   help="space between cells (default: %(default)s)")
+    p.add_argument("--caption", choices=sheet.CAPTIONS,
+                   help="print the content or the output name under each code")
+    p.add_argument("--caption-mm", type=float, default=sheet.DEFAULT_CAPTION_MM,
+                   help="caption text height (default: %(default)s)")
+    p.add_argument("--color", action="store_true", help="keep logos in color (larger pages)")
+    p.add_argument("--ecc", default=engine.DEFAULT_ERROR_CORRECTION,
+                   choices=sorted(engine.ERROR_CORRECTION_LEVELS) + [engine.AUTO],
+                   help="error correction level, or 'auto' to fit it to the logo "
+                        "(default: %(default)s)")
+    p.add_argument("--border", type=int, default=sheet.DEFAULT_BORDER,
+                   help="quiet zone in modules (default: %(default)s)")
+    p.add_argument("-q", "--quiet", action="store_true", help="do not report progress")
+    p.set_defaults(func=_cmd_sheet)
+
+    p = commands.add_parser("cache", help="inspect or trim the render cache")
+    p.add_argument("action", choices=("stats", "evict", "clear"))
+    _add_cache_options(p, required=True)
+    p.set_defaults(func=_cmd_cache)
+
+    p = commands.add_parser("serve", help="serve QR codes over HTTP")
+    p.add_argument("--host", default="127.0.0.1", help="address to bind (default: %(default)s)")
+    p.add_argument("--port", type=int, default=8080, help="port to listen on (default: %(default)s)")
+    p.add_argument("-j", "--workers", type=int, default=0,
+                   help="render processes, 0 for one per CPU core (default: %(default)s)")
+    p.add_argument("--queue-size", type=int, default=256,
+                   help="renders queued or running before returning 429 (default: %(default)s)")
+    p.add_argument("--cache-mb", type=float, default=64,
+                   help="in-memory response cache size (default: %(default)s)")
+    p.add_argument("--logo-dir", help="directory of logos clients may reference by file name")
+    p.add_argument("--max-age", type=int, default=86400,
+                   help="Cache-Control max-age in seconds (default: %(default)s)")
+    p.set_defaults(func=_cmd_serve)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    parser.add_argument("--metrics-log", action="store_true",
+                        help="print per-stage timings of every code as JSON lines on stderr")
+    parser.add_argument("--metrics-textfile-dir",
+                        help="write Prometheus textfile metrics (one file per process) here")
+    args = parser.parse_args(argv)
+    # Set through the environment so batch and server worker processes pick them up
+    if args.metrics_log:
+        os.environ["QRG_METRICS_LOG"] = "1"
+    if args.metrics_textfile_dir:
+        os.environ["QRG_METRICS_TEXTFILE_DIR"] = os.path.abspath(args.metrics_textfile_dir)
+    from . import metrics
+    metrics.configure_from_env()
+    return args.func(args)
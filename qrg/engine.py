@@ -0,0 +1,494 @@
+# Headless QR code generation engine
+#
+# Encodes content, renders it as PNG or SVG, composites an optional logo
+# and either returns the encoded bytes or writes them to a path. One
+# encode can also be fanned out to several renditions (sizes, formats,
+# colors) in a single call.
+# This module must never import tkinter.
+
+import math
+import numbers
+import os
+import uuid
+from collections import namedtuple
+from functools import lru_cache
+from io import BytesIO
+
+import numpy as np
+import qrcode
+import qrcode.exceptions
+from PIL import Image, ImageColor
+
+from . import logos, matrix, metrics, raster, svg
+from .cache import cache_key
+
+# --- Defaults (same values the desktop app has always used) ---
+DEFAULT_ERROR_CORRECTION = "H"  # High error correction is needed for embedding a logo
+DEFAULT_BOX_SIZE = 12
+DEFAULT_BORDER = 4
+FILL_COLOR = "black"
+BACK_COLOR = "white"
+LOGO_SCALE = 4  # Logo is sized to at most 1/LOGO_SCALE of the QR width
+MATRIX_CACHE_SIZE = 1024  # Encoded matrices kept per process (a version 40 code is ~31 KB)
+
+# --- Automatic error correction ---
+AUTO = "auto"
+AUTO_PLAIN_ERROR_CORRECTION = "M"  # Without a logo, M still survives wear and smudges
+LOGO_SAFETY_MARGIN = 2  # The logo may use at most 1/2 of each block's correction capacity
+
+ERROR_CORRECTION_LEVELS = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+
+FORMATS = ("png", "svg")
+
+# --- Renditions ---
+# fill_color/back_color of None use the format's defaults (SVGs have a
+# transparent background); logo=True uses the logo shared by the call,
+# False drops it and a path uses a different logo.
+Rendition = namedtuple("Rendition", "output_format box_size fill_color back_color logo output",
+                       defaults=("png", DEFAULT_BOX_SIZE, None, None, True, None))
+
+# The usual set: a screen-sized PNG, a 600 dpi-class print PNG and a vector file
+STANDARD_RENDITIONS = {
+    "web": Rendition("png", 8),
+    "print": Rendition("png", 32),
+    "svg": Rendition("svg"),
+}
+
+
+class GenerationError(Exception):
+    """Raised when a QR code cannot be generated with the given options."""
+
+
+class LogoError(GenerationError):
+    """Raised when a logo cannot be composited onto a QR code."""
+
+
+def normalize_format(output_format):
+    """Maps 'png', 'PNG (Digital)', '.svg', etc. to 'png' or 'svg'."""
+    name = str(output_format).strip().lower().lstrip('.')
+    for fmt in FORMATS:
+        if name.startswith(fmt):
+            return fmt
+    raise GenerationError(f"Unsupported output format: {output_format}")
+
+
+class EncodedQR:
+    """
+    A fitted QR module matrix plus the presentation settings to draw it.
+
+    The module matrix is shared with the encode cache and read-only;
+    changing box_size or border never requires re-encoding.
+    """
+
+    def __init__(self, modules, version, error_correction, box_size=DEFAULT_BOX_SIZE,
+                 border=DEFAULT_BORDER):
+        self.modules = modules
+        self.version = version
+        self.error_correction = error_correction
+        self.box_size = box_size
+        self.border = border
+        self._matrix = None
+
+    def get_matrix(self):
+        """The module matrix including the quiet-zone border (read-only)."""
+        if self._matrix is None:
+            matrix = np.pad(self.modules, self.border) if self.border else self.modules
+            matrix.setflags(write=False)
+            self._matrix = matrix
+        return self._matrix
+
+
+def resolve_colors(output_format, fill_color=None, back_color=None):
+    """Fills in the format's default colors and rejects names PIL cannot parse."""
+    fill_color = fill_color or FILL_COLOR
+    if back_color is None and output_format == "png":
+        back_color = BACK_COLOR
+    for color in (fill_color, back_color):
+        if color is not None:
+            try:
+                ImageColor.getrgb(color)
+            except ValueError:
+                raise GenerationError(f"Unknown color: {color}") from None
+    return fill_color, back_color
+
+
+def rendition_path(path, name, output_format):
+    """Output path of a named rendition: 'out/code.png' -> 'out/code-print.png'."""
+    return f"{os.path.splitext(path)[0]}-{name}.{output_format}"
+
+
+def _error_correction_level(error_correction):
+    name = str(error_correction).upper()
+    if name not in ERROR_CORRECTION_LEVELS:
+        raise GenerationError(f"Unknown error correction level: {error_correction}")
+    return name
+
+
+def _check_size(box_size, border):
+    if not isinstance(box_size, numbers.Integral) or box_size < 1:
+        raise GenerationError(f"Box size must be a whole number of pixels, at least 1: {box_size}")
+    if not isinstance(border, numbers.Integral) or border < 0:
+        raise GenerationError(f"Border must be a whole number of modules, at least 0: {border}")
+
+
+@lru_cache(maxsize=MATRIX_CACHE_SIZE)
+def encode(content, error_correction=DEFAULT_ERROR_CORRECTION, version=None):
+    """
+    Fits and encodes the content, returning (modules, version).
+
+    Uses the NumPy encoder in qrg.matrix, which builds the same matrix
+    as qrcode for the same segments; the segments themselves come from
+    qrg.segments, so the version is never larger than qrcode would pick.
+    Results are memoized per (content, ECC level, version hint). modules
+    is a read-only boolean array without border.
+    """
+    try:
+        modules, fitted_version = matrix.encode(content, ERROR_CORRECTION_LEVELS[error_correction],
+                                                version)
+    except (ValueError, qrcode.exceptions.DataOverflowError):
+        raise GenerationError("Content is too long to fit in a QR code.") from None
+    modules.setflags(write=False)
+    return modules, fitted_version
+
+
+def logo_coverage(qr, logo_path):
+    """
+    Boolean (n, n) array of the symbol modules the centered logo touches.
+
+    Measured in modules, so it is the same for every box_size: the logo
+    is taken at the largest size render_png gives it (1/LOGO_SCALE of
+    the width with the border) and rounded out to whole modules.
+    """
+    count = len(qr.modules)
+    total = count + 2 * qr.border
+    try:
+        width, height = logos.default_cache.source(logo_path).size
+    except Exception as e:
+        raise LogoError(f"Could not add logo: {e}") from e
+    scale = total / LOGO_SCALE / max(width, height)
+    x = (total - width * scale) / 2 - qr.border
+    y = (total - height * scale) / 2 - qr.border
+    first_col, end_col = max(0, math.floor(x)), min(count, math.ceil(x + width * scale))
+    first_row, end_row = max(0, math.floor(y)), min(count, math.ceil(y + height * scale))
+    covered = np.zeros((count, count), dtype=bool)
+    covered[first_row:end_row, first_col:end_col] = True
+    return covered
+
+
+def _logo_fits(qr, logo_path):
+    covered = logo_coverage(qr, logo_path)
+    damaged, ec_counts = matrix.damaged_codewords(
+        qr.version, ERROR_CORRECTION_LEVELS[qr.error_correction], covered)
+    return bool(np.all(damaged * LOGO_SAFETY_MARGIN <= ec_counts // 2))
+
+
+def choose_error_correction(content, logo_path=None, border=DEFAULT_BORDER, version=None):
+    """
+    Picks the lowest ECC level, and if need be a larger version, that
+    keeps the code readable under the logo. Returns (level, version).
+
+    Without a logo this is AUTO_PLAIN_ERROR_CORRECTION. With one, each
+    level from L up is encoded and accepted when the codewords the logo
+    covers stay within 1/LOGO_SAFETY_MARGIN of what every Reed-Solomon
+    block can correct. If not even H holds, larger versions are tried
+    at H (function patterns take a smaller share of bigger symbols).
+    Raises LogoError when none does; an unreadable logo gives H and
+    leaves the error to the renderer.
+    """
+    if not logo_path:
+        return AUTO_PLAIN_ERROR_CORRECTION, version
+    for level in ERROR_CORRECTION_LEVELS:
+        modules, fitted_version = encode(content, level, version)
+        try:
+            if _logo_fits(EncodedQR(modules, fitted_version, level, border=border), logo_path):
+                return level, version
+        except LogoError:
+            return "H", version
+    for larger in range(fitted_version + 1, 41):
+        modules, _ = encode(content, "H", larger)
+        if _logo_fits(EncodedQR(modules, larger, "H", border=border), logo_path):
+            return "H", larger
+    raise LogoError("The logo covers too much of the code for it to scan reliably; "
+                    "use a smaller logo or a fixed error correction level.")
+
+
+def make_qr(content, error_correction=DEFAULT_ERROR_CORRECTION,
+            box_size=DEFAULT_BOX_SIZE, border=DEFAULT_BORDER, version=None, logo_path=None):
+    """
+    Encodes the content (through the matrix cache) into an EncodedQR.
+
+    With error_correction='auto' the level (and possibly a larger
+    version) is chosen by choose_error_correction for the given logo;
+    the result's error_correction and version report what was used.
+    """
+    if not content:
+        raise GenerationError("Content cannot be empty.")
+    _check_size(box_size, border)
+    if str(error_correction).lower() == AUTO:
+        error_correction, version = choose_error_correction(content, logo_path, border, version)
+    error_correction = _error_correction_level(error_correction)
+    modules, fitted_version = encode(content, error_correction, version)
+    return EncodedQR(modules, fitted_version, error_correction, box_size, border)
+
+
+def render_png(qr, logo_path=None, box_size=None, timer=None,
+               fill_color=FILL_COLOR, back_color=BACK_COLOR):
+    """
+    Renders the QR code as a streaming PNG, with the logo if given.
+
+    Plain codes are written as 1-bit palette PNGs; with a logo the file
+    is RGB and only the logo region is composited in color. box_size
+    overrides qr.box_size (e.g. for small previews) without re-encoding.
+    Call to_image() on the result for a PIL image. An optional
+    metrics.Timer gets 'render' and 'logo' marks.
+    """
+    box_size = box_size or qr.box_size
+    matrix = qr.get_matrix()
+    logo = None
+    if timer:
+        timer.mark("render")
+    if logo_path:
+        try:
+            logo = logos.default_cache.get(logo_path, int(len(matrix) * box_size / LOGO_SCALE))
+        except Exception as e:
+            raise LogoError(f"Could not add logo: {e}") from e
+        if timer:
+            timer.mark("logo")
+    return raster.StreamingPngImage(matrix, box_size, fill_color, back_color, logo)
+
+
+def render_svg(qr, logo_path=None, box_size=None, fill_color=FILL_COLOR, back_color=None):
+    """
+    Renders the QR code as a streaming SVG with merged module runs.
+
+    A logo is embedded once as a base64 image over cleared modules.
+    box_size only sets the physical size; the background stays
+    transparent unless back_color is given.
+    """
+    logo = None
+    if logo_path:
+        try:
+            logo = svg.load_logo(logo_path)
+        except Exception as e:
+            raise LogoError(f"Could not add logo: {e}") from e
+    return svg.StreamingSvgImage(qr.get_matrix(), box_size or qr.box_size, fill_color, logo,
+                                 LOGO_SCALE, back_color)
+
+
+def save_image(img, output, output_format):
+    """
+    Writes a rendered image to a path or a binary file object.
+
+    A path is written to a temporary file and renamed over the target,
+    never rewritten in place: it may be a hard link into a RenderCache.
+    """
+    if _is_stream(output):
+        _save(img, output, output_format)
+        return
+    tmp = f"{os.fspath(output)}.{uuid.uuid4().hex}.part"
+    try:
+        _save(img, tmp, output_format)
+        os.replace(tmp, output)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _save(img, output, output_format):
+    if output_format == "png" and isinstance(img, Image.Image):
+        img.save(output, format="PNG")
+    else:
+        img.save(output)
+
+
+def request_key(content, output_format, logo_path=None,
+                error_correction=DEFAULT_ERROR_CORRECTION,
+                box_size=DEFAULT_BOX_SIZE, border=DEFAULT_BORDER,
+                fill_color=None, back_color=None, version=None):
+    """Stable hash of everything that affects the generated bytes."""
+    output_format = normalize_format(output_format)
+    fill_color, back_color = resolve_colors(output_format, fill_color, back_color)
+    options = dict(error_correction=str(error_correction).upper(), box_size=box_size,
+                   border=border, fill_color=fill_color, back_color=back_color)
+    if version is not None:
+        options["version"] = version  # Only for a version hint, so other keys stay stable
+    try:
+        return cache_key(content, output_format, logo_path, **options)
+    except OSError as e:
+        raise LogoError(f"Could not add logo: {e}") from e
+
+
+def _is_stream(output):
+    return hasattr(output, "write")
+
+
+def _read_cached(cache, key, output_format, output):
+    """Serves a request from the render cache like _write_result would; None on a miss."""
+    if output is None or _is_stream(output):
+        data = cache.read(key, output_format)
+        if data is None or output is None:
+            return data
+        output.write(data)
+        return output
+    return output if cache.fetch(key, output_format, output) else None
+
+
+def _write_result(img, output_format, output, cache=None, key=None):
+    """Saves img to a path or stream (or returns its bytes) and adds it to the cache."""
+    if output is not None and key is None:
+        save_image(img, output, output_format)
+        return output
+    if output is None or _is_stream(output):
+        buffer = BytesIO()
+        save_image(img, buffer, output_format)
+        if key is not None:
+            cache.store(key, output_format, data=buffer.getbuffer())
+        if output is None:
+            return buffer.getvalue()
+        output.write(buffer.getbuffer())
+        return output
+    save_image(img, output, output_format)
+    cache.store(key, output_format, source=output)
+    return output
+
+
+def generate(content, output_format="png", logo_path=None, output=None,
+             error_correction=DEFAULT_ERROR_CORRECTION,
+             box_size=DEFAULT_BOX_SIZE, border=DEFAULT_BORDER, cache=None,
+             fill_color=None, back_color=None):
+    """
+    Generates a QR code for the content.
+
+    error_correction is 'L', 'M', 'Q', 'H' or 'auto' (see make_qr).
+    output may be a path (the file is written and its path returned) or
+    a writable binary stream such as a BytesIO, an open file or
+    socket.makefile('wb') (the code is encoded straight into it and the
+    stream returned). Without output the encoded bytes are returned;
+    they are the render buffer itself, not a copy, so memoryview(result)
+    slices them for free. Colors default to black on white (transparent for SVG). With a
+    qrg.cache.RenderCache, identical requests are served from disk
+    without rendering.
+
+    When metrics hooks are registered, stage timings are reported through
+    qrg.metrics (both formats are streamed, so encoding counts as 'write').
+    """
+    rendition = Rendition(output_format, box_size, fill_color, back_color, True, output)
+    return generate_renditions(content, [rendition], logo_path, error_correction, border,
+                               cache)[0]
+
+
+def _strength(choice):
+    """Orders (level, version) choices from least to most robust."""
+    level, version = choice
+    return list(ERROR_CORRECTION_LEVELS).index(level), version or 0
+
+
+def generate_renditions(content, renditions, logo_path=None,
+                        error_correction=DEFAULT_ERROR_CORRECTION,
+                        border=DEFAULT_BORDER, cache=None, qr=None,
+                        progress=None, cancelled=None, timer=None):
+    """
+    Generates several renditions of one QR code in a single pass.
+
+    Each Rendition is returned as generate() would return it (the
+    bytes, the output path or the stream), in order. Every rendition
+    shows the same code: the content is encoded once, and only when
+    some rendition misses the cache (or not at all when an EncodedQR is
+    passed as qr). With 'auto' error correction the level is chosen
+    once for the payload, for the most demanding logo used. Logos are
+    decoded once and resized per box size.
+
+    For interactive callers, progress(stage) is called before the
+    'encode', 'render' and 'write' stages, and the call returns None
+    as soon as cancelled() is true between stages. A metrics.Timer
+    passed as timer collects the stage timings of all renditions.
+    """
+    if not content:
+        raise GenerationError("Content cannot be empty.")
+    specs = []
+    for rendition in renditions:
+        _check_size(rendition.box_size, qr.border if qr is not None else border)
+        output_format = normalize_format(rendition.output_format)
+        fill_color, back_color = resolve_colors(output_format, rendition.fill_color,
+                                                rendition.back_color)
+        logo = logo_path if rendition.logo is True else rendition.logo or None
+        output = rendition.output
+        if output is not None and not _is_stream(output):
+            output = os.fspath(output)
+        specs.append(rendition._replace(output_format=output_format, fill_color=fill_color,
+                                        back_color=back_color, logo=logo, output=output))
+
+    # Cache keys name the level actually used, unless 'auto' resolves
+    # the same way for every rendition (one logo), when no encode is needed
+    level, version = error_correction, None
+    if qr is not None:
+        level, version = qr.error_correction, qr.version
+    elif str(error_correction).lower() == AUTO:
+        logos_used = {spec.logo for spec in specs}
+        if len(logos_used) > 1:
+            level, version = max((choose_error_correction(content, logo, border)
+                                  for logo in logos_used), key=_strength)
+    key_level, key_version = level, version
+
+    results = []
+    for spec in specs:
+        rendition_timer = metrics.Timer() if metrics.hooks or timer else None
+        key = None
+        if cache is not None:
+            key = request_key(content, spec.output_format, spec.logo, key_level,
+                              spec.box_size, border, spec.fill_color, spec.back_color,
+                              key_version)
+            result = _read_cached(cache, key, spec.output_format, spec.output)
+            if result is not None:
+                if rendition_timer:
+                    rendition_timer.mark("cache")
+                    _finish_timer(rendition_timer, timer, format=spec.output_format,
+                                  payload_length=len(content), cached=True)
+                results.append(result)
+                continue
+
+        if qr is None:
+            if progress:
+                progress("encode")
+            if str(level).lower() == AUTO:
+                level, version = choose_error_correction(content, spec.logo, border)
+            qr = make_qr(content, level, spec.box_size, border, version)
+            if cancelled and cancelled():
+                return None
+        if rendition_timer:
+            rendition_timer.mark("encode")
+        if progress:
+            progress("render")
+        if spec.output_format == "png":
+            img = render_png(qr, spec.logo, spec.box_size, rendition_timer, spec.fill_color,
+                             spec.back_color)
+        else:
+            img = render_svg(qr, spec.logo, spec.box_size, spec.fill_color, spec.back_color)
+            if rendition_timer:
+                rendition_timer.mark("render")
+        if cancelled and cancelled():
+            return None
+        if progress:
+            progress("write")
+        results.append(_write_result(img, spec.output_format, spec.output, cache, key))
+
+        if rendition_timer:
+            rendition_timer.mark("write")
+            _finish_timer(rendition_timer, timer, format=spec.output_format,
+                          payload_length=len(content), version=qr.version,
+                          ecc=qr.error_correction, box_size=spec.box_size,
+                          logo=bool(spec.logo), cached=False)
+    return results
+
+
+def _finish_timer(rendition_timer, timer, **fields):
+    if timer is not None:
+        timer.merge(rendition_timer)
+    if metrics.hooks:
+        metrics.emit(rendition_timer, **fields)
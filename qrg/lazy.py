@@ -0,0 +1,31 @@
+# Deferred imports for fast startup
+#
+# The GUI only needs qrcode, Pillow and NumPy once the user actually
+# previews or generates a code, so it binds them to LazyModule stand-ins
+# and lets the window appear first.
+
+import importlib
+
+
+class LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access.
+
+    Safe to share between threads: importlib serializes the real import.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
@@ -0,0 +1,114 @@
+# Prepared logo cache
+#
+# Batch jobs paste the same logo onto thousands of codes. Opening,
+# converting and resizing it every time dominates the logo cost, so the
+# decoded RGBA thumbnail is kept in a small LRU cache instead. The full
+# decoded logo is cached too, so rendering several sizes of a code
+# decodes the file only once.
+
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+# Memory cap for cached logo bitmaps; QRG_LOGO_CACHE_MB overrides it for
+# every process, including batch workers.
+DEFAULT_MAX_BYTES = int(float(os.environ.get("QRG_LOGO_CACHE_MB", 64)) * 1024 * 1024)
+
+
+class LogoCache:
+    """
+    LRU cache of decoded, resized RGBA logos.
+
+    Entries are keyed by (path, mtime, target size), so editing a logo
+    on disk invalidates it automatically; the decoded original is kept
+    under target size None. Cached images are shared and must be
+    treated as read-only.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        """Approximate bytes held by cached bitmaps."""
+        return self._size
+
+    def get(self, path, target_size):
+        """Returns the logo at path, fitted within target_size x target_size."""
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime_ns
+        key = (path, mtime, target_size)
+        logo = self._lookup(key)
+        if logo is None:
+            logo = self._source(path, mtime).copy()
+            logo.thumbnail((target_size, target_size))
+            self._store(key, logo)
+        return logo
+
+    def source(self, path):
+        """Returns the decoded full-size logo, without counting a hit or miss."""
+        path = os.path.abspath(path)
+        return self._source(path, os.stat(path).st_mtime_ns)
+
+    def _source(self, path, mtime):
+        key = (path, mtime, None)
+        with self._lock:
+            logo = self._entries.get(key)
+            if logo is not None:
+                self._entries.move_to_end(key)
+                return logo
+        logo = self._load(path)
+        self._store(key, logo)
+        return logo
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": len(self._entries), "bytes": self._size}
+
+    def _lookup(self, key):
+        """Looks up a resized logo, counting the hit or miss."""
+        with self._lock:
+            logo = self._entries.get(key)
+            if logo is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return logo
+
+    @staticmethod
+    def _load(path):
+        with Image.open(path) as src:
+            return src.convert('RGBA')
+
+    def _store(self, key, logo):
+        nbytes = logo.width * logo.height * 4
+        if nbytes > self.max_bytes:
+            return  # Too big to cache; the caller still gets its image
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = logo
+            self._size += nbytes
+            while self._size > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self._size -= old.width * old.height * 4
+
+
+# Shared by every render in this process (and by each batch worker)
+default_cache = LogoCache()
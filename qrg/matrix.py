@@ -0,0 +1,339 @@
+# Accelerated QR matrix builder
+#
+# For given segments and version, builds exactly the module matrix that
+# qrcode's QRCode.makeImpl() produces, but replaces its per-module loops
+# with NumPy array operations: data placement, the eight mask patterns
+# and their penalty scores are computed for all masks at once, and
+# Reed-Solomon coding runs across all blocks in parallel. Segment
+# writing, the function patterns and the format bits still come from
+# qrcode itself, so both builders stay bit-for-bit identical.
+
+from functools import lru_cache
+
+import numpy as np
+import qrcode
+from qrcode import base, exceptions, util
+
+from . import segments
+
+MASK_COUNT = 8
+
+# Finder-like 1:1:3:1:1 patterns with four light modules on one side,
+# as 11-bit integers (qrcode's penalty rule 3)
+FINDER_PATTERNS = (0b10111010000, 0b00001011101)
+
+
+class BitBuffer:
+    """
+    Drop-in for qrcode.util.BitBuffer backed by one integer.
+
+    qrcode's buffer appends one bit at a time; QRData.write() only needs
+    put() and len(), so whole fields are shifted in at once here.
+    """
+
+    def __init__(self):
+        self.value = 0
+        self.length = 0
+
+    def put(self, num, length):
+        self.value = (self.value << length) | (num & ((1 << length) - 1))
+        self.length += length
+
+    def put_bit(self, bit):
+        self.put(1 if bit else 0, 1)
+
+    def __len__(self):
+        return self.length
+
+    def to_bytes(self):
+        """The bits so far, zero-padded to whole bytes."""
+        padding = -self.length % 8
+        return (self.value << padding).to_bytes((self.length + padding) // 8, "big")
+
+
+def _segment_bits(data_list, version):
+    buffer = BitBuffer()
+    for data in data_list:
+        buffer.put(data.mode, 4)
+        buffer.put(len(data), util.length_in_bits(data.mode, version))
+        data.write(buffer)
+    return buffer
+
+
+# --- Reed-Solomon coding ---
+
+def _gf_mul(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return base.gexp(base.glog(a) + base.glog(b))
+
+
+@lru_cache(maxsize=None)
+def _rs_table(ec_count):
+    """(256, ec_count) table: every byte times the generator polynomial (minus its leading 1)."""
+    generator = [1]
+    for i in range(ec_count):
+        factor = base.gexp(i)
+        generator = ([generator[0]]
+                     + [generator[k] ^ _gf_mul(generator[k - 1], factor) for k in range(1, len(generator))]
+                     + [_gf_mul(generator[-1], factor)])
+    table = np.array([[_gf_mul(value, coeff) for coeff in generator[1:]] for value in range(256)],
+                     dtype=np.uint8)
+    table.setflags(write=False)
+    return table
+
+
+def _rs_remainders(blocks, ec_count):
+    """Error correction codewords for equally-protected data blocks, all at once."""
+    table = _rs_table(ec_count)
+    width = max(len(block) for block in blocks)
+    # Leading zeros do not change the remainder, so short blocks are left-padded
+    data = np.zeros((len(blocks), width), dtype=np.uint8)
+    for i, block in enumerate(blocks):
+        data[i, width - len(block):] = list(block)
+    remainder = np.zeros((len(blocks), ec_count), dtype=np.uint8)
+    for k in range(width):
+        factor = data[:, k] ^ remainder[:, 0]
+        remainder[:, :-1] = remainder[:, 1:]
+        remainder[:, -1] = 0
+        remainder ^= table[factor]
+    return remainder.tolist()
+
+
+def create_data(version, error_correction, data_list):
+    """The interleaved data and error correction codewords (qrcode's util.create_data)."""
+    buffer = _segment_bits(data_list, version)
+    rs_blocks = base.rs_blocks(version, error_correction)
+    bit_limit = sum(block.data_count * 8 for block in rs_blocks)
+    if len(buffer) > bit_limit:
+        raise exceptions.DataOverflowError(
+            f"Code length overflow. Data size ({len(buffer)}) > size available ({bit_limit})")
+
+    # Terminator, byte alignment, then alternating pad bytes
+    buffer.put(0, min(bit_limit - len(buffer), 4))
+    codewords = buffer.to_bytes()
+    pad = bytes((util.PAD0, util.PAD1)) * (bit_limit // 16 + 1)
+    codewords += pad[:bit_limit // 8 - len(codewords)]
+
+    blocks = []
+    offset = 0
+    for block in rs_blocks:
+        blocks.append(codewords[offset:offset + block.data_count])
+        offset += block.data_count
+
+    ec_blocks = [None] * len(blocks)
+    by_ec_count = {}
+    for i, block in enumerate(rs_blocks):
+        by_ec_count.setdefault(block.total_count - block.data_count, []).append(i)
+    for ec_count, indexes in by_ec_count.items():
+        for i, ec in zip(indexes, _rs_remainders([blocks[i] for i in indexes], ec_count)):
+            ec_blocks[i] = ec
+
+    data = []
+    for group in (blocks, ec_blocks):
+        for i in range(max(len(block) for block in group)):
+            data.extend(block[i] for block in group if i < len(block))
+    return data
+
+
+# --- Module placement ---
+
+class _Recorder:
+    """Stands in for QRCode.modules and records (row, col, value) assignments."""
+
+    def __init__(self):
+        self.cells = []
+
+    def __getitem__(self, row):
+        recorder = self
+
+        class Row:
+            def __setitem__(self, col, value):
+                recorder.cells.append((row, col, bool(value)))
+
+        return Row()
+
+
+@lru_cache(maxsize=40)
+def _layout(version):
+    """
+    Returns (template, rows, cols) for a version.
+
+    template holds the function patterns with the format and version
+    cells cleared, as qrcode draws them while scoring masks; rows/cols
+    are the data module coordinates in placement order.
+    """
+    count = version * 4 + 17
+    qr = qrcode.QRCode(version=version, border=0)
+    qr.modules_count = count
+    qr.modules = [[None] * count for _ in range(count)]
+    qr.setup_position_probe_pattern(0, 0)
+    qr.setup_position_probe_pattern(count - 7, 0)
+    qr.setup_position_probe_pattern(0, count - 7)
+    qr.setup_position_adjust_pattern()
+    qr.setup_timing_pattern()
+    qr.setup_type_info(True, 0)
+    if version >= 7:
+        qr.setup_type_number(True)
+
+    # Same upward/downward zigzag over column pairs as QRCode.map_data
+    rows, cols = [], []
+    row, step = count - 1, -1
+    for col in range(count - 1, 0, -2):
+        if col <= 6:
+            col -= 1
+        while 0 <= row < count:
+            for c in (col, col - 1):
+                if qr.modules[row][c] is None:
+                    rows.append(row)
+                    cols.append(c)
+            row += step
+        row -= step
+        step = -step
+
+    template = np.array([[bool(module) for module in line] for line in qr.modules])
+    return template, np.array(rows), np.array(cols)
+
+
+@lru_cache(maxsize=40)
+def _masks(version):
+    """The eight mask patterns as one (8, n, n) boolean array."""
+    count = version * 4 + 17
+    i, j = np.indices((count, count))
+    masks = np.stack([
+        (i + j) % 2 == 0,
+        i % 2 == 0,
+        j % 3 == 0,
+        (i + j) % 3 == 0,
+        (i // 2 + j // 3) % 2 == 0,
+        (i * j) % 2 + (i * j) % 3 == 0,
+        ((i * j) % 2 + (i * j) % 3) % 2 == 0,
+        ((i * j) % 3 + (i + j) % 2) % 2 == 0,
+    ])
+    masks.setflags(write=False)
+    return masks
+
+
+@lru_cache(maxsize=512)
+def _format_cells(version, error_correction, mask_pattern):
+    """(rows, cols, values) of the format and version information qrcode writes."""
+    qr = qrcode.QRCode(version=version, error_correction=error_correction, border=0)
+    qr.modules_count = version * 4 + 17
+    qr.modules = _Recorder()
+    qr.setup_type_info(False, mask_pattern)
+    if version >= 7:
+        qr.setup_type_number(False)
+    rows, cols, values = zip(*qr.modules.cells)
+    return np.array(rows), np.array(cols), np.array(values)
+
+
+@lru_cache(maxsize=160)
+def codeword_blocks(version, error_correction):
+    """
+    Returns (blocks, ec_counts): the RS block of every codeword in
+    placement order, and the error correction codewords of each block.
+    """
+    rs_blocks = base.rs_blocks(version, error_correction)
+    data_counts = [block.data_count for block in rs_blocks]
+    ec_counts = [block.total_count - block.data_count for block in rs_blocks]
+    order = []
+    for counts in (data_counts, ec_counts):
+        for i in range(max(counts)):
+            order.extend(b for b, count in enumerate(counts) if i < count)
+    return np.array(order), np.array(ec_counts)
+
+
+def damaged_codewords(version, error_correction, covered):
+    """
+    Counts, per RS block, the codewords with a module under covered.
+
+    covered is a boolean (n, n) array over the symbol (no border).
+    Returns (damaged, ec_counts) as arrays indexed by block.
+    """
+    _, rows, cols = _layout(version)
+    blocks, ec_counts = codeword_blocks(version, error_correction)
+    hit = covered[rows, cols][:len(blocks) * 8]  # Remainder bits belong to no codeword
+    codewords = np.unique(np.flatnonzero(hit) // 8)
+    return np.bincount(blocks[codewords], minlength=len(ec_counts)), ec_counts
+
+
+# --- Penalty scoring (qrcode's util.lost_point, for a stack of matrices) ---
+
+def _run_penalty(stack):
+    """Rule 1: runs of five or more same-colored modules along each row."""
+    masks, count, _ = stack.shape
+    cells = np.full((masks, count, count + 1), 2, dtype=np.int8)  # 2 separates rows
+    cells[:, :, :count] = stack
+    cells = cells.ravel()
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(cells)) + 1))
+    lengths = np.diff(np.append(starts, cells.size))
+    scoring = (lengths >= 5) & (cells[starts] != 2)
+    return np.bincount(starts[scoring] // (count * (count + 1)),
+                       weights=lengths[scoring] - 2, minlength=masks).astype(np.int64)
+
+
+def _block_penalty(stack):
+    """Rule 2: 2x2 blocks of one color."""
+    top_left = stack[:, :-1, :-1]
+    same = ((top_left == stack[:, :-1, 1:]) & (top_left == stack[:, 1:, :-1])
+            & (top_left == stack[:, 1:, 1:]))
+    return same.sum(axis=(1, 2)) * 3
+
+
+def _finder_penalty(stack):
+    """Rule 3: finder-like patterns along each row."""
+    count = stack.shape[2]
+    windows = np.zeros(stack[:, :, :count - 10].shape, dtype=np.int16)
+    for k in range(11):
+        windows = (windows << 1) | stack[:, :, k:count - 10 + k]
+    found = (windows == FINDER_PATTERNS[0]) | (windows == FINDER_PATTERNS[1])
+    return found.sum(axis=(1, 2)) * 40
+
+
+def lost_points(stack):
+    """Penalty score of every matrix in an (m, n, n) stack."""
+    transposed = stack.transpose(0, 2, 1)
+    scores = (_run_penalty(stack) + _run_penalty(transposed) + _block_penalty(stack)
+              + _finder_penalty(stack) + _finder_penalty(transposed))
+    count = stack.shape[1]
+    # Rule 4: dark module ratio, with the same float arithmetic as qrcode
+    for i, dark_count in enumerate(stack.sum(axis=(1, 2)).tolist()):
+        percent = float(dark_count) / (count ** 2)
+        scores[i] += int(abs(percent * 100 - 50) / 5) * 10
+    return scores
+
+
+def build(data_list, version, error_correction):
+    """
+    Places the codewords, picks the best mask and returns (modules, mask).
+
+    Identical to QRCode.makeImpl(False, QRCode.best_mask_pattern()).
+    """
+    template, rows, cols = _layout(version)
+    codewords = np.array(create_data(version, error_correction, data_list), dtype=np.uint8)
+    bits = np.zeros(len(rows), dtype=bool)
+    data_bits = np.unpackbits(codewords).astype(bool)[:len(rows)]
+    bits[:len(data_bits)] = data_bits
+
+    stack = np.repeat(template[None], MASK_COUNT, axis=0)
+    stack[:, rows, cols] = bits ^ _masks(version)[:, rows, cols]
+    mask_pattern = int(np.argmin(lost_points(stack)))  # First lowest score, like qrcode
+
+    modules = stack[mask_pattern]
+    format_rows, format_cols, values = _format_cells(version, error_correction, mask_pattern)
+    modules[format_rows, format_cols] = values
+    return modules, mask_pattern
+
+
+def encode(content, error_correction, version=None):
+    """
+    Segments, fits and encodes content; returns (modules, version).
+
+    The payload is split into its cheapest mix of modes (qrg.segments)
+    before the smallest version is chosen. modules is a boolean array
+    without border. Raises qrcode's DataOverflowError (or ValueError)
+    when it cannot fit.
+    """
+    data_list, fitted = segments.fit(content, error_correction, version)
+    modules, _ = build(data_list, fitted, error_correction)
+    return modules, fitted
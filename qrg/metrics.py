@@ -0,0 +1,219 @@
+# Per-stage timing hooks for the generation path
+#
+# engine.generate() records how long encode, render, logo composite and
+# write took, plus payload length and the QR version chosen, and hands
+# the event to every registered hook. With no hooks registered nothing
+# is timed at all.
+#
+# Hooks can also be enabled per process through the environment, which
+# reaches batch and server worker processes too:
+#   QRG_METRICS_LOG=1                  JSON line per generation on stderr
+#   QRG_METRICS_TEXTFILE_DIR=/path     Prometheus textfile collector output
+
+import atexit
+import json
+import logging
+import multiprocessing.util
+import os
+import sys
+import threading
+import time
+
+hooks = []
+_env_hooks = {}  # Hooks registered by configure_from_env, by variable name
+
+STAGES = ("encode", "render", "logo", "write")
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)  # Seconds
+
+
+def add_hook(hook):
+    """Registers hook(event) to be called after every generation."""
+    hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    hooks.remove(hook)
+
+
+class Timer:
+    """Accumulates wall time per stage; mark() closes the current stage."""
+
+    __slots__ = ("started", "last", "durations")
+
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.durations = {}
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.durations[stage] = self.durations.get(stage, 0.0) + now - self.last
+        self.last = now
+
+    def merge(self, other):
+        """Adds the stage durations of another timer to this one."""
+        for stage, seconds in other.durations.items():
+            self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+        self.last = time.perf_counter()
+
+    @property
+    def total(self):
+        return self.last - self.started
+
+    def summary(self):
+        """Short human-readable breakdown, e.g. for a status bar."""
+        parts = [f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in self.durations.items()]
+        return ", ".join(parts)
+
+
+def emit(timer, **fields):
+    """Builds the event for a finished generation and passes it to every hook."""
+    event = dict(fields)
+    event["durations_ms"] = {stage: round(s * 1000, 3) for stage, s in timer.durations.items()}
+    event["total_ms"] = round(timer.total * 1000, 3)
+    for hook in list(hooks):
+        try:
+            hook(event)
+        except Exception:
+            logging.getLogger(__name__).exception("Metrics hook failed")
+
+
+class LogHook:
+    """Writes each event as one JSON line (to stderr by default)."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+
+    def __call__(self, event):
+        self.stream.write(json.dumps(event, sort_keys=True) + "\n")
+
+
+class PrometheusTextfileHook:
+    """
+    Aggregates events and writes them in Prometheus text format.
+
+    Meant for node_exporter's textfile collector: each process writes
+    its own qrg_<pid>.prom in the directory, at most once per interval.
+    A forked pool worker starts from zero with its own file, which a
+    background thread keeps flushing (pool workers never run atexit),
+    as long as the hook is still registered in hooks.
+    """
+
+    def __init__(self, directory, interval=5.0):
+        self.directory = directory
+        self.interval = interval
+        os.makedirs(directory, exist_ok=True)
+        self._start()
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"qrg_{os.getpid()}.prom")
+
+    def _start(self):
+        """Resets the counts and sets up flushing for the current process."""
+        self._count = {}
+        self._stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self._buckets = [0] * len(HISTOGRAM_BUCKETS)
+        self._total_seconds = 0.0
+        self._last_write = 0.0
+        self._dirty = False
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+        threading.Thread(target=self._flush_periodically, daemon=True).start()
+
+    def _register_finalizer(self):
+        # Pool workers exit without running atexit, but do run these
+        multiprocessing.util.Finalize(self, self.flush, exitpriority=10)
+
+    def _flush_periodically(self):
+        pid = os.getpid()
+        while os.getpid() == pid:
+            time.sleep(self.interval)
+            with self._lock:
+                if self._dirty:
+                    self._write()
+
+    def __call__(self, event):
+        total = event["total_ms"] / 1000
+        with self._lock:
+            key = (event.get("format", ""), "true" if event.get("cached") else "false")
+            self._count[key] = self._count.get(key, 0) + 1
+            for stage, ms in event["durations_ms"].items():
+                self._stage_seconds[stage] = self._stage_seconds.get(stage, 0.0) + ms / 1000
+            for i, bound in enumerate(HISTOGRAM_BUCKETS):
+                if total <= bound:
+                    self._buckets[i] += 1
+            self._total_seconds += total
+            self._dirty = True
+            if time.monotonic() - self._last_write >= self.interval:
+                self._write()
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._write()
+
+    def _write(self):
+        pid = f'pid="{os.getpid()}"'
+        count = sum(self._count.values())
+        lines = ["# HELP qrg_generations_total QR codes generated.",
+                 "# TYPE qrg_generations_total counter"]
+        for (fmt, cached), n in sorted(self._count.items()):
+            lines.append(f'qrg_generations_total{{{pid},format="{fmt}",cached="{cached}"}} {n}')
+        lines += ["# HELP qrg_stage_seconds_total Time spent per generation stage.",
+                  "# TYPE qrg_stage_seconds_total counter"]
+        for stage, seconds in sorted(self._stage_seconds.items()):
+            lines.append(f'qrg_stage_seconds_total{{{pid},stage="{stage}"}} {seconds:.6f}')
+        lines += ["# HELP qrg_generation_seconds Total time per generation.",
+                  "# TYPE qrg_generation_seconds histogram"]
+        for bound, n in zip(HISTOGRAM_BUCKETS, self._buckets):
+            lines.append(f'qrg_generation_seconds_bucket{{{pid},le="{bound}"}} {n}')
+        lines.append(f'qrg_generation_seconds_bucket{{{pid},le="+Inf"}} {count}')
+        lines.append(f'qrg_generation_seconds_sum{{{pid}}} {self._total_seconds:.6f}')
+        lines.append(f'qrg_generation_seconds_count{{{pid}}} {count}')
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.path)  # The collector must never see a partial file
+        self._last_write = time.monotonic()
+        self._dirty = False
+
+
+def _textfile_hooks():
+    return [hook for hook in hooks if isinstance(hook, PrometheusTextfileHook)]
+
+
+def _restart_in_child():
+    for hook in _textfile_hooks():
+        hook._start()
+
+
+def _register_finalizers(_):
+    for hook in _textfile_hooks():
+        hook._register_finalizer()
+
+
+# One process-wide registration each (neither can be undone), so removed
+# hooks are not restarted in children
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_in_child)
+# multiprocessing children drop inherited finalizers, then run this
+multiprocessing.util.register_after_fork(_register_finalizers, _register_finalizers)
+
+
+def configure_from_env(environ=os.environ):
+    """
+    Registers the hooks requested through QRG_METRICS_* variables.
+
+    Safe to call again (e.g. after the CLI sets the variables): each
+    variable registers at most one hook per process.
+    """
+    if environ.get("QRG_METRICS_LOG") and "QRG_METRICS_LOG" not in _env_hooks:
+        _env_hooks["QRG_METRICS_LOG"] = add_hook(LogHook())
+    if environ.get("QRG_METRICS_TEXTFILE_DIR") and "QRG_METRICS_TEXTFILE_DIR" not in _env_hooks:
+        _env_hooks["QRG_METRICS_TEXTFILE_DIR"] = add_hook(
+            PrometheusTextfileHook(environ["QRG_METRICS_TEXTFILE_DIR"]))
+
+
+configure_from_env()
@@ -0,0 +1,100 @@
+# Cached download of remote logo thumbnails
+#
+# Used for the Debian edition's header logo. The decoded thumbnail is
+# kept on disk together with the server's ETag / Last-Modified, so later
+# launches show it instantly (and offline) and only revalidate it.
+#
+# requests and Pillow are imported inside the functions that need them,
+# so checking for a cached thumbnail at startup stays cheap.
+
+import hashlib
+import json
+import os
+from io import BytesIO
+
+THUMBNAIL_SIZE = (50, 50)
+FETCH_TIMEOUT = 5  # Seconds
+
+
+def default_cache_dir():
+    """Per-user cache directory (XDG_CACHE_HOME aware)."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "qr-g", "logos")
+
+
+def _paths(url, cache_dir):
+    name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, name + ".png"), os.path.join(cache_dir, name + ".json")
+
+
+def cached_image_path(url, cache_dir=None):
+    """Returns the path of the cached PNG thumbnail, or None if there is none."""
+    image_path, _ = _paths(url, cache_dir or default_cache_dir())
+    return image_path if os.path.exists(image_path) else None
+
+
+def load_cached(url, cache_dir=None):
+    """Returns the cached thumbnail for url, or None if there is none."""
+    from PIL import Image
+
+    image_path, _ = _paths(url, cache_dir or default_cache_dir())
+    try:
+        with Image.open(image_path) as img:
+            img.load()
+            return img
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def refresh(url, cache_dir=None, size=THUMBNAIL_SIZE, timeout=FETCH_TIMEOUT):
+    """
+    Revalidates the cached thumbnail against the server.
+
+    Returns the new thumbnail when the server sent a changed image, or
+    None when the cached copy is still current. Network and decode
+    errors are raised to the caller.
+    """
+    import requests
+    from PIL import Image
+
+    cache_dir = cache_dir or default_cache_dir()
+    image_path, meta_path = _paths(url, cache_dir)
+
+    headers = {}
+    if os.path.exists(image_path):
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = requests.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status() # Raise exception for bad status codes
+
+    img = Image.open(BytesIO(response.content))
+    img.thumbnail(size)
+    if img.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+        img = img.convert('RGBA')
+
+    os.makedirs(cache_dir, exist_ok=True)
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    _write_atomic(image_path, buffer.getvalue())
+    meta = {"url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified")}
+    _write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+    return img
@@ -0,0 +1,150 @@
+# Optimal segmentation of QR payloads
+#
+# qrcode only switches to numeric or alphanumeric mode for runs of 20 or
+# more characters. Finding the cheapest mix of numeric, alphanumeric,
+# byte (and optionally kanji) segments instead often saves a version or
+# two on URLs with long numeric IDs or upper-case query parts.
+
+from bisect import bisect_left
+
+from qrcode import exceptions, util
+
+# Character count field widths change at versions 10 and 27, so the best
+# segmentation is computed once per range
+VERSION_RANGES = ((1, 9), (10, 26), (27, 40))
+
+ALPHANUMERIC = frozenset(util.ALPHA_NUM.decode('ascii'))
+
+# DP states: the mode of the segment that ends at the current character,
+# plus how many characters of a numeric/alphanumeric segment are still
+# waiting for a full group (which decides what the next character costs)
+BYTE, ALNUM_ODD, ALNUM_EVEN, NUM_1, NUM_2, NUM_0, KANJI = range(7)
+STATE_MODES = (util.MODE_8BIT_BYTE, util.MODE_ALPHA_NUM, util.MODE_ALPHA_NUM,
+               util.MODE_NUMBER, util.MODE_NUMBER, util.MODE_NUMBER, util.MODE_KANJI)
+INFINITY = float('inf')
+
+
+class KanjiData:
+    """A kanji mode segment (13 bits per Shift JIS double-byte character)."""
+
+    mode = util.MODE_KANJI
+
+    def __init__(self, text):
+        self.data = text.encode('shift_jis')
+
+    def __len__(self):
+        return len(self.data) // 2
+
+    def write(self, buffer):
+        for i in range(0, len(self.data), 2):
+            code = (self.data[i] << 8) | self.data[i + 1]
+            code -= 0x8140 if code <= 0x9FFC else 0xC140
+            buffer.put((code >> 8) * 0xC0 + (code & 0xFF), 13)
+
+
+def is_kanji(char):
+    """True if the character has a double-byte Shift JIS code kanji mode can hold."""
+    try:
+        data = char.encode('shift_jis')
+    except UnicodeEncodeError:
+        return False
+    if len(data) != 2:
+        return False
+    code = (data[0] << 8) | data[1]
+    return 0x8140 <= code <= 0x9FFC or 0xE040 <= code <= 0xEBBF
+
+
+def optimal_modes(text, sizes, kanji=False):
+    """
+    Returns (modes, bits): the mode of every character in the cheapest
+    segmentation and the total size of the encoded segments in bits.
+
+    sizes maps each mode to its character count field width (see
+    qrcode.util.mode_sizes_for_version).
+    """
+    byte_header = 4 + sizes[util.MODE_8BIT_BYTE]
+    alnum_header = 4 + sizes[util.MODE_ALPHA_NUM]
+    num_header = 4 + sizes[util.MODE_NUMBER]
+    kanji_header = 4 + sizes[util.MODE_KANJI]
+
+    cost = [INFINITY] * 7
+    best, best_state = 0, None
+    back = []
+    for char in text:
+        byte_bits = 8 if char < '\x80' else 8 * len(char.encode('utf-8'))
+        new = [INFINITY] * 7
+        prev = [None] * 7
+
+        # Byte mode holds everything; continuing is never worse than restarting
+        if cost[BYTE] <= best + byte_header:
+            new[BYTE], prev[BYTE] = cost[BYTE] + byte_bits, BYTE
+        else:
+            new[BYTE], prev[BYTE] = best + byte_bits + byte_header, best_state
+        if char in ALPHANUMERIC:
+            if cost[ALNUM_EVEN] + 6 <= best + alnum_header + 6:
+                new[ALNUM_ODD], prev[ALNUM_ODD] = cost[ALNUM_EVEN] + 6, ALNUM_EVEN
+            else:
+                new[ALNUM_ODD], prev[ALNUM_ODD] = best + alnum_header + 6, best_state
+            new[ALNUM_EVEN], prev[ALNUM_EVEN] = cost[ALNUM_ODD] + 5, ALNUM_ODD
+            if '0' <= char <= '9':
+                if cost[NUM_0] + 4 <= best + num_header + 4:
+                    new[NUM_1], prev[NUM_1] = cost[NUM_0] + 4, NUM_0
+                else:
+                    new[NUM_1], prev[NUM_1] = best + num_header + 4, best_state
+                new[NUM_2], prev[NUM_2] = cost[NUM_1] + 3, NUM_1
+                new[NUM_0], prev[NUM_0] = cost[NUM_2] + 3, NUM_2
+        elif kanji and is_kanji(char):
+            if cost[KANJI] <= best + kanji_header:
+                new[KANJI], prev[KANJI] = cost[KANJI] + 13, KANJI
+            else:
+                new[KANJI], prev[KANJI] = best + kanji_header + 13, best_state
+
+        cost = new
+        back.append(prev)
+        best = min(cost)
+        best_state = cost.index(best)
+
+    # Walk the back pointers from the cheapest final state
+    modes = [None] * len(text)
+    state = best_state
+    for i in range(len(text) - 1, -1, -1):
+        modes[i] = STATE_MODES[state]
+        state = back[i][state]
+    return modes, best
+
+
+def make_segments(text, modes):
+    """Groups characters of equal mode into qrcode QRData (or KanjiData) segments."""
+    segments = []
+    start = 0
+    for i in range(1, len(text) + 1):
+        if i < len(text) and modes[i] == modes[start]:
+            continue
+        chunk = text[start:i]
+        mode = modes[start]
+        if mode == util.MODE_KANJI:
+            segments.append(KanjiData(chunk))
+        else:
+            segments.append(util.QRData(chunk.encode('utf-8'), mode=mode, check_data=False))
+        start = i
+    return segments
+
+
+def fit(text, error_correction, start=None, kanji=False):
+    """
+    Returns (segments, version): the cheapest segmentation of text and
+    the smallest version (from start on) that holds it.
+
+    Raises qrcode's DataOverflowError when no version is large enough.
+    """
+    start = start or 1
+    util.check_version(start)
+    limits = util.BIT_LIMIT_TABLE[error_correction]
+    for first, last in VERSION_RANGES:
+        if last < start or len(text) * 10 // 3 > limits[last]:
+            continue  # Even all-numeric text (3 1/3 bits a character) would not fit
+        modes, bits = optimal_modes(text, util.mode_sizes_for_version(first), kanji)
+        version = bisect_left(limits, bits, max(first, start), last + 1)
+        if version <= last:
+            return make_segments(text, modes), version
+    raise exceptions.DataOverflowError()
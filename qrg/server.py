@@ -0,0 +1,305 @@
+# HTTP generation service
+#
+#   python QR-G.py serve --port 8080
+#   GET  /qr?content=https://intercuba.net&format=svg
+#   POST /qr  {"content": "...", "format": "png", "ecc": "H", "box_size": 12}
+#
+# Rendering runs on a bounded process pool. Responses carry an ETag
+# derived from the request parameters, hot responses are kept in an
+# in-memory LRU, and requests beyond the queue limit get a 429.
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import engine
+
+DEFAULT_PORT = 8080
+DEFAULT_QUEUE_SIZE = 256               # Renders queued or running before 429s
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024  # In-memory response cache
+DEFAULT_MAX_AGE = 86400                # Cache-Control max-age, in seconds
+MAX_BODY_BYTES = 64 * 1024
+MAX_BOX_SIZE = 100
+MAX_BORDER = 20
+
+CONTENT_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+class RequestError(Exception):
+    """Bad request parameters; reported to the client as a 400."""
+
+
+class Overloaded(Exception):
+    """The render queue is full; reported to the client as a 429."""
+
+
+class ResponseCache:
+    """Thread-safe LRU of rendered response bodies, bounded by total bytes."""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self._size -= len(old)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self._entries), "bytes": self._size}
+
+
+class QRService:
+    """Validates requests and renders them on a bounded process pool."""
+
+    def __init__(self, workers=None, queue_size=DEFAULT_QUEUE_SIZE,
+                 cache_bytes=DEFAULT_CACHE_BYTES, logo_dir=None, max_age=DEFAULT_MAX_AGE):
+        self.pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        self.cache = ResponseCache(cache_bytes)
+        self.logo_dir = os.path.abspath(logo_dir) if logo_dir else None
+        self.max_age = max_age
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._inflight = {}  # key -> Future, so concurrent identical requests render once
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.pool.shutdown()
+
+    def parse(self, params):
+        """Turns query/body parameters into generate() keyword arguments."""
+        def param(*names, default=None):
+            for name in names:
+                value = params.get(name)
+                if isinstance(value, list):
+                    value = value[0] if value else None
+                if value not in (None, ""):
+                    return value
+            return default
+
+        def number(names, default, limit):
+            try:
+                value = int(param(*names, default=default))
+            except (TypeError, ValueError):
+                raise RequestError(f"'{names[0]}' must be an integer") from None
+            if not 0 <= value <= limit:
+                raise RequestError(f"'{names[0]}' must be between 0 and {limit}")
+            return value
+
+        content = param("content", "url", "data")
+        if not content:
+            raise RequestError("'content' is required")
+        try:
+            output_format = engine.normalize_format(param("format", default="png"))
+        except engine.GenerationError as e:
+            raise RequestError(str(e)) from None
+        ecc = str(param("ecc", "error_correction", default=engine.DEFAULT_ERROR_CORRECTION)).upper()
+        if ecc == engine.AUTO.upper():
+            ecc = engine.AUTO
+        elif ecc not in engine.ERROR_CORRECTION_LEVELS:
+            raise RequestError("'ecc' must be one of L, M, Q, H or auto")
+
+        return dict(
+            content=content,
+            output_format=output_format,
+            logo_path=self._logo_path(param("logo")),
+            error_correction=ecc,
+            box_size=max(1, number(("box_size", "box"), engine.DEFAULT_BOX_SIZE, MAX_BOX_SIZE)),
+            border=number(("border",), engine.DEFAULT_BORDER, MAX_BORDER),
+        )
+
+    def _logo_path(self, name):
+        """Logos are referenced by name and must live in the configured logo_dir."""
+        if not name:
+            return None
+        if self.logo_dir is None:
+            raise RequestError("logos are not enabled on this server")
+        path = os.path.abspath(os.path.join(self.logo_dir, name))
+        if os.path.dirname(path) != self.logo_dir or not os.path.isfile(path):
+            raise RequestError(f"unknown logo: {name}")
+        return path
+
+    def request_key(self, options):
+        """Cache key of validated options; the ETag is derived from it without rendering."""
+        try:
+            return engine.request_key(**options)
+        except engine.GenerationError as e:
+            raise RequestError(str(e)) from None
+
+    def render(self, options, key=None):
+        """
+        Returns (etag, body) for validated options.
+
+        Raises Overloaded when the render queue is full.
+        """
+        if key is None:
+            key = self.request_key(options)
+        etag = f'"{key}"'
+        body = self.cache.get(key)
+        if body is not None:
+            return etag, body
+
+        submitted = False
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                if not self._slots.acquire(blocking=False):
+                    self.rejected += 1
+                    raise Overloaded()
+                future = self.pool.submit(engine.generate, **options)
+                self._inflight[key] = future
+                submitted = True
+        # Outside the lock: a future that already finished runs the callback
+        # right here, and _finished needs the lock
+        if submitted:
+            future.add_done_callback(lambda f, key=key: self._finished(key, f))
+
+        try:
+            body = future.result()
+        except engine.GenerationError as e:
+            raise RequestError(str(e)) from None
+        return etag, body
+
+    def _finished(self, key, future):
+        with self._lock:
+            self._inflight.pop(key, None)
+        self._slots.release()
+        if not future.cancelled() and future.exception() is None:
+            self.cache.put(key, future.result())
+
+    def stats(self):
+        with self._lock:
+            inflight = len(self._inflight)
+        return {"cache": self.cache.stats(), "inflight": inflight, "rejected": self.rejected}
+
+
+class QRRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, important for small cached responses
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    server_version = "QR-G"
+    service = None  # Set by serve()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/qr":
+            self._handle_qr(parse_qs(url.query))
+        elif url.path == "/stats":
+            self._send_json(200, self.service.stats())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/qr":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_json(400, {"error": "invalid Content-Length"})
+            self.close_connection = True  # The body cannot be skipped reliably
+            return
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": "request body too large"})
+            return
+        body = self.rfile.read(length)
+        try:
+            if self.headers.get_content_type() == "application/json":
+                params = json.loads(body or b"{}")
+                if not isinstance(params, dict):
+                    raise ValueError("expected a JSON object")
+            else:
+                params = parse_qs(body.decode("utf-8"))
+        except ValueError as e:
+            self._send_json(400, {"error": f"invalid body: {e}"})
+            return
+        self._handle_qr(params)
+
+    def _handle_qr(self, params):
+        service = self.service
+        try:
+            options = service.parse(params)
+            key = service.request_key(options)
+            # The ETag only depends on the parameters, so revalidation never renders
+            etag = f'"{key}"'
+            headers = {"ETag": etag, "Cache-Control": f"public, max-age={service.max_age}"}
+            if etag in (self.headers.get("If-None-Match") or ""):
+                self._send(304, headers)
+                return
+            etag, body = service.render(options, key)
+        except RequestError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except Overloaded:
+            self._send_json(429, {"error": "server busy, retry later"}, {"Retry-After": "1"})
+            return
+
+        headers["Content-Type"] = CONTENT_TYPES[options["output_format"]]
+        self._send(200, headers, body)
+
+    def _send_json(self, status, payload, headers=None):
+        headers = dict(headers or {}, **{"Content-Type": "application/json", "Cache-Control": "no-store"})
+        self._send(status, headers, json.dumps(payload).encode("utf-8"))
+
+    def _send(self, status, headers, body=b""):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Per-request logging costs more than the cached responses themselves
+
+
+def make_server(host="127.0.0.1", port=DEFAULT_PORT, **service_options):
+    """Builds (but does not start) the HTTP server and its QRService."""
+    service = QRService(**service_options)
+    handler = type("BoundQRRequestHandler", (QRRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, service
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, **service_options):
+    """Runs the service until interrupted."""
+    server, service = make_server(host, port, **service_options)
+    print(f"Serving QR codes on http://{host}:{server.server_port}/qr")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
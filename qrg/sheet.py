@@ -0,0 +1,369 @@
+# Sheet layout: many QR codes tiled onto print-ready pages
+#
+# Codes are drawn straight into one preallocated page canvas, which is
+# written out as soon as it is full (a PNG per page, or one page of a
+# multi-page PDF). SVG sheets are vector, one file per page. Only one
+# page is ever held in memory, however long the manifest is.
+
+import os
+import zlib
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from PIL import Image, ImageDraw, ImageFont
+
+from . import engine, logos, raster, svg
+from .batch import BatchItem
+
+MM_PER_INCH = 25.4
+POINTS_PER_INCH = 72
+
+# --- Defaults ---
+PAGE_SIZES = {  # Portrait width x height in millimetres
+    "a4": (210.0, 297.0),
+    "letter": (215.9, 279.4),
+}
+DEFAULT_DPI = 300
+DEFAULT_COLUMNS = 4
+DEFAULT_ROWS = 6
+DEFAULT_MARGIN_MM = 10.0
+DEFAULT_GAP_MM = 4.0
+DEFAULT_CAPTION_MM = 3.0  # Caption text height
+DEFAULT_BORDER = 2  # Cells are already spaced, so a smaller quiet zone is enough
+
+SHEET_FORMATS = ("png", "pdf", "svg")
+CAPTIONS = ("content", "name")
+
+PAGE_COMPRESS_LEVEL = 6
+
+
+class SheetLayout:
+    """
+    Page size, resolution and grid of a sheet.
+
+    Each cell holds one code, scaled to the largest whole number of
+    pixels per module that fits (with room for the caption, if any).
+    """
+
+    def __init__(self, page="a4", dpi=DEFAULT_DPI, columns=DEFAULT_COLUMNS, rows=DEFAULT_ROWS,
+                 margin_mm=DEFAULT_MARGIN_MM, gap_mm=DEFAULT_GAP_MM, caption=None,
+                 caption_mm=DEFAULT_CAPTION_MM, landscape=False):
+        if page not in PAGE_SIZES:
+            raise engine.GenerationError(f"Unknown page size: {page}")
+        if caption not in (None,) + CAPTIONS:
+            raise engine.GenerationError(f"Unknown caption: {caption}")
+        width_mm, height_mm = PAGE_SIZES[page]
+        if landscape:
+            width_mm, height_mm = height_mm, width_mm
+        self.page = page
+        self.dpi = dpi
+        self.columns = columns
+        self.rows = rows
+        self.caption = caption
+        self.page_mm = (width_mm, height_mm)
+        self.size = (self.px(width_mm), self.px(height_mm))
+        self.margin = self.px(margin_mm)
+        self.gap = self.px(gap_mm)
+        self.caption_height = self.px(caption_mm * 1.5) if caption else 0
+        self.font_size = self.px(caption_mm)
+
+        self.cell_width = (self.size[0] - 2 * self.margin - (columns - 1) * self.gap) // columns
+        self.cell_height = (self.size[1] - 2 * self.margin - (rows - 1) * self.gap) // rows
+        if min(self.cell_width, self.cell_height - self.caption_height) < 21:
+            raise engine.GenerationError("The grid does not fit on the page.")
+
+    @property
+    def per_page(self):
+        return self.columns * self.rows
+
+    def px(self, mm):
+        """Converts millimetres to pixels at the sheet resolution."""
+        return round(mm / MM_PER_INCH * self.dpi)
+
+    def cell(self, slot):
+        """(x, y) of the top-left pixel of the slot-th cell on a page."""
+        row, col = divmod(slot, self.columns)
+        return (self.margin + col * (self.cell_width + self.gap),
+                self.margin + row * (self.cell_height + self.gap))
+
+    def place(self, slot, count):
+        """Returns (x, y, box_size) for a code of count modules in a cell."""
+        x, y = self.cell(slot)
+        box_size = min(self.cell_width, self.cell_height - self.caption_height) // count
+        if box_size < 1:
+            raise engine.GenerationError("The code is too dense for the cell size.")
+        return x + (self.cell_width - count * box_size) // 2, y, box_size
+
+
+class SheetStats:
+    """Counters for a sheet job."""
+
+    def __init__(self):
+        self.codes = 0
+        self.pages = 0
+        self.failed = 0
+        self.paths = []
+
+    def __str__(self):
+        return f"{self.codes} codes on {self.pages} pages, {self.failed} failed"
+
+
+def sheet_format(output):
+    """Format of a sheet from its output file name."""
+    ext = os.path.splitext(output)[1].lower().lstrip('.')
+    if ext not in SHEET_FORMATS:
+        raise engine.GenerationError(f"Unsupported sheet format: {ext or output}")
+    return ext
+
+
+def page_path(output, number):
+    """labels.png -> labels-0001.png; PDF sheets are a single file."""
+    root, ext = os.path.splitext(output)
+    return f"{root}-{number:04d}{ext}"
+
+
+def caption_text(item, caption):
+    if caption == "name":
+        return os.path.splitext(os.path.basename(item.output))[0]
+    return item.content
+
+
+@lru_cache(maxsize=8)
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except (TypeError, AttributeError, ImportError):
+        return ImageFont.load_default()  # Pillow without FreeType or before 10.1
+
+
+def _fit_caption(draw, text, font, width):
+    """Shortens text with an ellipsis until it fits in width pixels."""
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + "…", font=font) > width:
+        text = text[:-1]
+    return text + "…"
+
+
+# --- Raster pages (PNG, PDF) ---
+
+class RasterPage:
+    """A preallocated page canvas that codes are drawn into."""
+
+    def __init__(self, layout, mode="L"):
+        self.layout = layout
+        self.image = Image.new(mode, layout.size, engine.BACK_COLOR)
+        self.draw = ImageDraw.Draw(self.image)
+
+    def add(self, slot, qr, logo_path=None, caption=None):
+        layout = self.layout
+        matrix = qr.get_matrix()
+        x, y, box_size = layout.place(slot, len(matrix))
+        logo = None
+        if logo_path:
+            try:
+                logo = logos.default_cache.get(logo_path, int(len(matrix) * box_size / engine.LOGO_SCALE))
+            except Exception as e:
+                raise engine.LogoError(f"Could not add logo: {e}") from e
+        code = raster.StreamingPngImage(matrix, box_size, engine.FILL_COLOR, engine.BACK_COLOR,
+                                        logo).to_image()
+        self.image.paste(code, (x, y))
+        if caption:
+            font = _font(layout.font_size)
+            cell_x, _ = layout.cell(slot)
+            text = _fit_caption(self.draw, caption, font, layout.cell_width)
+            self.draw.text((cell_x + layout.cell_width // 2, y + len(matrix) * box_size),
+                           text, fill=engine.FILL_COLOR, font=font, anchor="mt")
+
+    def clear(self):
+        self.draw.rectangle((0, 0) + self.layout.size, fill=engine.BACK_COLOR)
+
+
+class PdfWriter:
+    """
+    Streams a multi-page PDF with one full-page image per page.
+
+    Objects are written as pages arrive; only the byte offsets and page
+    object numbers are kept until the cross-reference table at close().
+    """
+
+    def __init__(self, stream, page_mm):
+        self.stream = stream
+        self.width = page_mm[0] / MM_PER_INCH * POINTS_PER_INCH
+        self.height = page_mm[1] / MM_PER_INCH * POINTS_PER_INCH
+        self.offsets = {}
+        self.pages = []
+        self.position = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        self.next_id = 3
+
+    def _write(self, data):
+        self.stream.write(data)
+        self.position += len(data)
+
+    def _object(self, number, body, stream_data=None):
+        self.offsets[number] = self.position
+        self._write(f"{number} 0 obj\n".encode('ascii') + body)
+        if stream_data is not None:
+            self._write(b"\nstream\n")
+            self._write(stream_data)
+            self._write(b"\nendstream")
+        self._write(b"\nendobj\n")
+
+    def add_page(self, image):
+        image_id, content_id, page_id = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+        color_space = "/DeviceGray" if image.mode == "L" else "/DeviceRGB"
+        data = zlib.compress(image.tobytes(), PAGE_COMPRESS_LEVEL)
+        self._object(image_id, (
+            f"<< /Type /XObject /Subtype /Image /Width {image.width} /Height {image.height} "
+            f"/ColorSpace {color_space} /BitsPerComponent 8 /Filter /FlateDecode "
+            f"/Length {len(data)} >>").encode('ascii'), data)
+        del data
+        content = f"q {self.width:.2f} 0 0 {self.height:.2f} 0 0 cm /Im0 Do Q".encode('ascii')
+        self._object(content_id, f"<< /Length {len(content)} >>".encode('ascii'), content)
+        self._object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.width:.2f} {self.height:.2f}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> "
+            f"/Contents {content_id} 0 R >>").encode('ascii'))
+        self.pages.append(page_id)
+
+    def close(self):
+        kids = " ".join(f"{page} 0 R" for page in self.pages)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>".encode('ascii'))
+        xref = self.position
+        lines = [f"xref\n0 {self.next_id}\n", "0000000000 65535 f \n"]
+        lines += [f"{self.offsets[number]:010d} 00000 n \n" for number in range(1, self.next_id)]
+        lines.append(f"trailer\n<< /Size {self.next_id} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n")
+        self._write("".join(lines).encode('ascii'))
+
+
+# --- Vector pages (SVG) ---
+
+class SvgPage:
+    """Writes one page as an SVG document, code by code."""
+
+    def __init__(self, layout, path):
+        self.layout = layout
+        self.path = path
+        self.tmp_path = path + ".part"
+        self.stream = open(self.tmp_path, "wb")
+        width_mm, height_mm = layout.page_mm
+        self.stream.write(
+            f'<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<svg xmlns="{svg.SVG_NAMESPACE}" xmlns:xlink="{svg.XLINK_NAMESPACE}" version="1.1" '
+            f'width="{width_mm}mm" height="{height_mm}mm" '
+            f'viewBox="0 0 {layout.size[0]} {layout.size[1]}" shape-rendering="crispEdges">'
+            .encode('ascii'))
+
+    def add(self, slot, qr, logo_path=None, caption=None):
+        layout = self.layout
+        matrix = qr.get_matrix()
+        x, y, box_size = layout.place(slot, len(matrix))
+        logo = None
+        if logo_path:
+            try:
+                logo = svg.load_logo(logo_path)
+            except Exception as e:
+                raise engine.LogoError(f"Could not add logo: {e}") from e
+        self.stream.write(f'<g transform="translate({x} {y}) scale({box_size})">'.encode('ascii'))
+        svg.write_svg_code(matrix, self.stream, box_size, engine.FILL_COLOR, logo, engine.LOGO_SCALE)
+        self.stream.write(b'</g>')
+        if caption:
+            cell_x, _ = layout.cell(slot)
+            self.stream.write(
+                f'<text x="{cell_x + layout.cell_width // 2}" y="{y + len(matrix) * box_size}" '
+                f'font-family="sans-serif" font-size="{layout.font_size}" text-anchor="middle" '
+                f'dominant-baseline="hanging" fill="{engine.FILL_COLOR}">{escape(caption)}</text>'
+                .encode('utf-8'))
+
+    def close(self):
+        self.stream.write(b'</svg>\n')
+        self.stream.close()
+        os.replace(self.tmp_path, self.path)
+
+
+# --- Driver ---
+
+def render_sheets(items, output, layout=None, mode="L", progress=None, on_error=None,
+                  error_correction=engine.DEFAULT_ERROR_CORRECTION, border=DEFAULT_BORDER):
+    """
+    Tiles the codes of items (BatchItems, or plain strings) onto pages.
+
+    output names the sheet file: 'labels.pdf' is one multi-page PDF,
+    'labels.png' / 'labels.svg' become labels-0001.png, ... Use mode
+    'RGB' to keep logos in color on PNG and PDF pages. progress is
+    called with the SheetStats after every page, on_error with
+    (item, exception) for codes that could not be placed.
+    """
+    layout = layout or SheetLayout()
+    output = os.fspath(output)
+    fmt = sheet_format(output)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    stats = SheetStats()
+
+    pdf_file = pdf = raster_page = page = None
+    if fmt == "pdf":
+        pdf_file = open(output + ".part", "wb")
+        pdf = PdfWriter(pdf_file, layout.page_mm)
+    if fmt != "svg":
+        raster_page = RasterPage(layout, mode)
+
+    def finish_page():
+        nonlocal page
+        stats.pages += 1
+        if fmt == "svg":
+            page.close()
+            stats.paths.append(page.path)
+            page = None
+        elif fmt == "pdf":
+            pdf.add_page(raster_page.image)
+        else:
+            path = page_path(output, stats.pages)
+            raster_page.image.save(path + ".part", format="PNG", compress_level=PAGE_COMPRESS_LEVEL)
+            os.replace(path + ".part", path)
+            stats.paths.append(path)
+        if raster_page is not None:
+            raster_page.clear()
+        if progress:
+            progress(stats)
+
+    slot = 0
+    try:
+        for index, item in enumerate(items):
+            if isinstance(item, str):
+                item = BatchItem(index, item, item, None, None)
+            if fmt == "svg" and page is None:
+                page = SvgPage(layout, page_path(output, stats.pages + 1))
+            target = page if fmt == "svg" else raster_page
+            try:
+                if item.error is not None:
+                    raise item.error
+                qr = engine.make_qr(item.content, error_correction, border=border,
+                                    logo_path=item.logo_path)
+                caption = caption_text(item, layout.caption) if layout.caption else None
+                target.add(slot, qr, item.logo_path, caption)
+            except engine.GenerationError as e:
+                stats.failed += 1
+                if on_error:
+                    on_error(item, e)
+                continue
+            stats.codes += 1
+            slot += 1
+            if slot == layout.per_page:
+                finish_page()
+                slot = 0
+        if slot:
+            finish_page()
+        if pdf is not None:
+            pdf.close()
+            pdf_file.close()
+            os.replace(output + ".part", output)
+            stats.paths.append(output)
+    finally:
+        if pdf_file is not None and not pdf_file.closed:
+            pdf_file.close()
+        if page is not None:
+            page.stream.close()  # Interrupted: leave only the .part file behind
+    return stats
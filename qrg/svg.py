@@ -0,0 +1,166 @@
+# Streaming SVG writer
+#
+# Writes a QR module matrix as a single <path>, merging each horizontal
+# run of dark modules into one rectangle. Rows are streamed straight to
+# the output, so no DOM is ever built in memory.
+
+import base64
+import math
+import os
+from collections import namedtuple
+from decimal import Decimal
+from functools import lru_cache
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+SVG_NAMESPACE = "http://www.w3.org/2000/svg"
+XLINK_NAMESPACE = "http://www.w3.org/1999/xlink"
+
+# Formats embedded as-is; anything else is re-encoded to PNG once
+EMBED_AS_IS = {"PNG": "image/png", "JPEG": "image/jpeg", "GIF": "image/gif"}
+
+EmbeddedLogo = namedtuple("EmbeddedLogo", "data_uri width height")
+
+
+def _mm(pixels):
+    """Same physical scale qrcode's SVG factories use: box_size 10 = 1mm."""
+    return f"{Decimal(pixels) / 10}mm"
+
+
+def _num(value):
+    return f"{value:.3f}".rstrip('0').rstrip('.')
+
+
+@lru_cache(maxsize=16)
+def _encode_logo(path, mtime_ns):
+    with open(path, 'rb') as f:
+        data = f.read()
+    with Image.open(BytesIO(data)) as img:
+        width, height = img.size
+        mime = EMBED_AS_IS.get(img.format)
+        if mime is None:
+            buffer = BytesIO()
+            img.save(buffer, format="PNG")
+            data, mime = buffer.getvalue(), "image/png"
+    uri = f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+    return EmbeddedLogo(uri, width, height)
+
+
+def load_logo(path):
+    """
+    Returns the logo as a base64 data URI plus its pixel size.
+
+    The encoded logo is cached per (path, mtime), so a batch that puts
+    the same logo on every code only reads and encodes it once.
+    """
+    path = os.path.abspath(path)
+    return _encode_logo(path, os.stat(path).st_mtime_ns)
+
+
+def logo_box(count, box_size, logo, logo_scale):
+    """
+    Returns (x, y, width, height) of the centered logo in module units.
+
+    Matches the PNG renderer: the logo fits within 1/logo_scale of the
+    code's width and is never scaled up beyond its own pixel size.
+    """
+    max_pixels = int(count * box_size / logo_scale)
+    scale = min(1.0, max_pixels / max(logo.width, logo.height))
+    width = logo.width * scale / box_size
+    height = logo.height * scale / box_size
+    return (count - width) / 2, (count - height) / 2, width, height
+
+
+def iter_runs(matrix):
+    """Yields (row, col, length) for every horizontal run of dark modules."""
+    modules = np.asarray(matrix, dtype=bool)
+    padded = np.zeros((modules.shape[0], modules.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = modules
+    edges = np.diff(padded, axis=1)
+    start_rows, start_cols = np.nonzero(edges == 1)
+    _, end_cols = np.nonzero(edges == -1)
+    return zip(start_rows.tolist(), start_cols.tolist(), (end_cols - start_cols).tolist())
+
+
+def write_svg_code(matrix, stream, box_size, fill_color="black", logo=None, logo_scale=4):
+    """
+    Streams the path (and logo image) of one code in module units.
+
+    This is the body of write_svg without the document wrapper, so
+    several codes can be placed on one page with a transform.
+    """
+    count = len(matrix)
+    modules = np.array(matrix, dtype=bool)
+    if logo is not None:
+        x, y, width, height = logo_box(count, box_size, logo, logo_scale)
+        modules[math.floor(y):math.ceil(y + height), math.floor(x):math.ceil(x + width)] = False
+
+    stream.write(f'<path fill="{fill_color}" d="'.encode('ascii'))
+    row_parts = []
+    current_row = None
+    for row, col, length in iter_runs(modules):
+        if row != current_row and row_parts:
+            stream.write(''.join(row_parts).encode('ascii'))
+            row_parts = []
+        current_row = row
+        row_parts.append(f"M{col},{row}h{length}v1h-{length}z")
+    stream.write(''.join(row_parts).encode('ascii'))
+    stream.write(b'"/>')
+
+    if logo is not None:
+        stream.write(
+            f'<image x="{_num(x)}" y="{_num(y)}" width="{_num(width)}" height="{_num(height)}" '
+            f'preserveAspectRatio="xMidYMid meet" xlink:href="'.encode('ascii'))
+        stream.write(logo.data_uri.encode('ascii'))
+        stream.write(b'"/>')
+
+
+def write_svg(matrix, stream, box_size, fill_color="black", logo=None, logo_scale=4,
+              back_color=None):
+    """
+    Streams the SVG document for a module matrix (border included) to a binary stream.
+
+    With an EmbeddedLogo, the modules under it are cleared and the logo
+    is drawn centered on top. The background is transparent unless a
+    back_color is given.
+    """
+    count = len(matrix)
+    size = _mm(count * box_size)
+    stream.write(
+        f'<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="{SVG_NAMESPACE}" xmlns:xlink="{XLINK_NAMESPACE}" version="1.1" '
+        f'width="{size}" height="{size}" '
+        f'viewBox="0 0 {count} {count}" shape-rendering="crispEdges">'.encode('ascii'))
+    if back_color:
+        stream.write(f'<rect width="{count}" height="{count}" fill="{back_color}"/>'.encode('ascii'))
+    write_svg_code(matrix, stream, box_size, fill_color, logo, logo_scale)
+    stream.write(b'</svg>\n')
+
+
+class StreamingSvgImage:
+    """
+    Deferred SVG render of a QR matrix.
+
+    Mirrors the save() interface of qrcode's image classes, but writes
+    directly to the target instead of building an element tree.
+    """
+
+    def __init__(self, matrix, box_size, fill_color="black", logo=None, logo_scale=4,
+                 back_color=None):
+        self.matrix = matrix
+        self.box_size = box_size
+        self.fill_color = fill_color
+        self.logo = logo
+        self.logo_scale = logo_scale
+        self.back_color = back_color
+
+    def save(self, stream):
+        """Writes the SVG to a path or a binary file object."""
+        if isinstance(stream, (str, bytes)) or hasattr(stream, '__fspath__'):
+            with open(stream, 'wb') as f:
+                self.save(f)
+        else:
+            write_svg(self.matrix, stream, self.box_size, self.fill_color,
+                      self.logo, self.logo_scale, self.back_color)
@@ -0,0 +1,100 @@
+import zipfile
+
+import pytest
+
+from qrg import archive
+from qrg.archive import ArchiveReader, ArchiveWriter
+
+MEMBERS = {"codes/one.png": b"\x89PNG one", "codes/twö.svg": b"<svg/>", "three.png": b"3" * 1000}
+
+
+def _write(path, members):
+    with ArchiveWriter(str(path)) as writer:
+        for name, data in members.items():
+            writer.add(name, data)
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "codes.zip"
+    _write(path, MEMBERS)
+    with ArchiveReader(str(path)) as reader:
+        assert sorted(reader) == sorted(MEMBERS)
+        views = {name: reader.get(name) for name in reader}
+        assert {name: bytes(view) for name, view in views.items()} == MEMBERS
+        for view in views.values():
+            view.release()
+        with pytest.raises(KeyError):
+            reader.get("missing.png")
+
+
+def test_zipfile_reads_the_archive(tmp_path):
+    path = tmp_path / "codes.zip"
+    _write(path, MEMBERS)
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        assert {info.filename: zf.read(info) for info in zf.infolist()} == MEMBERS
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in zf.infolist())
+
+
+def test_zip64_entry_count(tmp_path):
+    path = tmp_path / "many.zip"
+    count = archive.MAX_16 + 10
+    _write(path, {f"{i}.png": str(i).encode() for i in range(count)})
+    with ArchiveReader(str(path)) as reader:
+        assert len(reader) == count
+        view = reader.get(f"{count - 1}.png")
+        assert bytes(view) == str(count - 1).encode()
+        view.release()
+    with zipfile.ZipFile(path) as zf:
+        assert len(zf.infolist()) == count
+        assert zf.read(f"{count - 1}.png") == str(count - 1).encode()
+
+
+def _cut_points(path):
+    """Offsets inside the last member's header, inside its data, and inside the directory."""
+    with zipfile.ZipFile(path) as zf:
+        last = zf.infolist()[-1]
+        directory = zf.start_dir
+    return {"header": last.header_offset + 10,
+            "data": directory - 5,
+            "directory": directory + 10}
+
+
+@pytest.mark.parametrize("cut", ["header", "data", "directory"])
+def test_resume_after_truncation(tmp_path, cut):
+    path = tmp_path / "codes.zip"
+    _write(path, MEMBERS)
+    with open(path, "r+b") as f:
+        f.truncate(_cut_points(path)[cut])
+
+    kept = dict(MEMBERS) if cut == "directory" else dict(list(MEMBERS.items())[:-1])
+    with ArchiveWriter(str(path), resume=True) as writer:
+        assert writer.names == set(kept)
+        writer.add("four.png", b"four")
+    kept["four.png"] = b"four"
+
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        assert {info.filename: zf.read(info) for info in zf.infolist()} == kept
+    with ArchiveReader(str(path)) as reader:
+        assert sorted(reader) == sorted(kept)
+
+
+def test_resume_refuses_foreign_archives(tmp_path):
+    path = tmp_path / "deflated.zip"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("a.png", b"a" * 100)
+    with pytest.raises(ValueError):
+        ArchiveWriter(str(path), resume=True)
+
+
+def test_reader_checks_the_directory_bounds(tmp_path):
+    path = tmp_path / "codes.zip"
+    _write(path, MEMBERS)
+    with open(path, "r+b") as f:
+        data = f.read()
+        end = data.rfind(b"PK\x05\x06")
+        f.seek(end + 12)  # Directory size field of the end record
+        f.write((len(data) * 2).to_bytes(4, "little"))
+    with pytest.raises(ValueError, match="truncated"):
+        ArchiveReader(str(path))
@@ -0,0 +1,55 @@
+import json
+import os
+
+from qrg import batch
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return str(path)
+
+
+def test_bad_jsonl_rows_fail_alone(tmp_path):
+    manifest = _write(tmp_path / "m.jsonl", "\n".join([
+        json.dumps({"content": "https://a.example/1", "output": "one.png"}),
+        "{not json",
+        json.dumps(["a", "list"]),
+        json.dumps({"content": "https://a.example/2", "output": "b.jpg"}),
+        json.dumps({"content": "https://a.example/3", "output": "three.svg"}),
+    ]) + "\n")
+    failed = []
+    stats = batch.run_batch(batch.read_manifest(manifest), str(tmp_path / "out"),
+                            on_error=lambda item, e: failed.append(item.index))
+    assert (stats.done, stats.failed) == (2, 3)
+    assert failed == [1, 2, 3]
+    assert sorted(os.listdir(tmp_path / "out")) == ["one.png", "three.svg"]
+
+
+def test_outputs_outside_the_output_dir_are_rejected(tmp_path):
+    escape = tmp_path / "escape.png"
+    manifest = _write(tmp_path / "m.csv", "content,output\n"
+                      f"a,../escape.png\nb,{escape}\nc,sub/ok.png\n")
+    failed = []
+    stats = batch.run_batch(batch.read_manifest(manifest), str(tmp_path / "out"),
+                            on_error=lambda item, e: failed.append(item.index))
+    assert (stats.done, stats.failed) == (1, 2)
+    assert failed == [0, 1]
+    assert not escape.exists()
+    assert (tmp_path / "out" / "sub" / "ok.png").exists()
+
+
+def test_bad_rows_fail_in_worker_processes_too(tmp_path):
+    manifest = _write(tmp_path / "m.jsonl", "[1]\n" + json.dumps({"content": "x"}) + "\n")
+    stats = batch.run_batch(batch.read_manifest(manifest), str(tmp_path / "out"), workers=2,
+                            chunk_size=1)
+    assert (stats.done, stats.failed) == (1, 1)
+
+
+def test_csv_manifest_with_a_byte_order_mark(tmp_path):
+    manifest = str(tmp_path / "m.csv")
+    with open(manifest, "w", encoding="utf-8-sig") as f:
+        f.write("content,output\nhttps://a.example/1,one.png\n")
+    stats = batch.run_batch(batch.read_manifest(manifest), str(tmp_path / "out"))
+    assert (stats.done, stats.failed) == (1, 0)
+    assert os.listdir(tmp_path / "out") == ["one.png"]
@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+
+from qrg import cli, engine
+from qrg.cache import RenderCache, cache_key
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("link", [True, False])
+def test_hit_and_miss(tmp_path, link):
+    cache = RenderCache(str(tmp_path / "cache"), link=link)
+    key = cache_key("AAA", "png")
+    output = str(tmp_path / "out.png")
+    assert not cache.fetch(key, "png", output)
+    cache.store(key, "png", data=b"stored")
+    assert cache.fetch(key, "png", output)
+    assert _read(output) == b"stored"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_a_miss_leaves_the_output_alone(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+    output = tmp_path / "out.png"
+    output.write_bytes(b"mine")
+    assert not cache.fetch(cache_key("AAA", "png"), "png", str(output))
+    assert output.read_bytes() == b"mine"
+    assert sorted(os.listdir(tmp_path)) == ["cache", "out.png"]
+
+
+@pytest.mark.parametrize("link", [True, False])
+def test_rewriting_an_output_does_not_change_the_cache(tmp_path, link):
+    cache = RenderCache(str(tmp_path / "cache"), link=link)
+    output = str(tmp_path / "out.png")
+    first = _read(engine.generate("AAA", output=output, cache=cache))
+    second = _read(engine.generate("BBB", output=output, cache=cache))
+    engine.generate("CCC", output=output)
+    assert cache.read(engine.request_key("AAA", "png"), "png") == first
+    assert cache.read(engine.request_key("BBB", "png"), "png") == second
+    assert engine.generate("AAA", output=output, cache=cache) == output
+    assert _read(output) == first
+
+
+def test_store_copies_without_link(tmp_path):
+    source = tmp_path / "source.png"
+    source.write_bytes(b"rendered")
+    cache = RenderCache(str(tmp_path / "cache"), link=False)
+    key = cache_key("AAA", "png")
+    cache.store(key, "png", source=str(source))
+    assert os.stat(cache._path(key, "png")).st_ino != os.stat(source).st_ino
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=350)
+    keys = [cache_key(str(i), "png") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.store(key, "png", data=bytes(100))
+        os.utime(cache._path(key, "png"), (i, i))
+    cache.read(keys[0], "png")  # Now the most recently used
+    cache.store(cache_key("3", "png"), "png", data=bytes(100))
+    assert cache.read(keys[0], "png") is not None
+    assert cache.read(keys[1], "png") is None
+    assert cache.stats()["bytes"] <= 350
+
+
+def test_cli_stats_leave_out_per_process_counters(tmp_path, capsys):
+    RenderCache(str(tmp_path)).store(cache_key("AAA", "png"), "png", data=b"x")
+    assert cli.main(["cache", "stats", "--cache-dir", str(tmp_path)]) == 0
+    stats = json.loads(capsys.readouterr().out)
+    assert stats["entries"] == 1
+    assert "hits" not in stats and "misses" not in stats
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from qrg import engine, matrix
+
+
+@pytest.fixture
+def square_logo(tmp_path):
+    path = str(tmp_path / "square.png")
+    Image.new("RGB", (200, 200), (200, 30, 30)).save(path)
+    return path
+
+
+def _within_margin(qr, logo_path):
+    covered = engine.logo_coverage(qr, logo_path)
+    damaged, ec_counts = matrix.damaged_codewords(
+        qr.version, engine.ERROR_CORRECTION_LEVELS[qr.error_correction], covered)
+    return np.all(damaged * engine.LOGO_SAFETY_MARGIN <= ec_counts // 2)
+
+
+def test_logo_coverage_does_not_depend_on_box_size(square_logo):
+    coverages = [engine.logo_coverage(engine.make_qr("https://intercuba.net", "H", box_size),
+                                      square_logo)
+                 for box_size in (1, 4, 8, 12, 32)]
+    assert all(np.array_equal(coverages[0], c) for c in coverages)
+
+
+def test_auto_raises_the_version_when_h_is_not_enough(square_logo):
+    content = "https://e.example/abc"
+    assert not _within_margin(engine.make_qr(content, "H"), square_logo)
+    qr = engine.make_qr(content, "auto", logo_path=square_logo)
+    assert qr.error_correction == "H"
+    assert qr.version > engine.make_qr(content, "H").version
+    assert _within_margin(qr, square_logo)
+
+
+def test_auto_reports_a_logo_too_large_for_any_version(square_logo, monkeypatch):
+    monkeypatch.setattr(engine, "LOGO_SCALE", 1.5)
+    with pytest.raises(engine.LogoError):
+        engine.make_qr("https://e.example/abc", "auto", logo_path=square_logo)
+
+
+def test_auto_without_a_logo():
+    qr = engine.make_qr("https://intercuba.net", "auto")
+    assert qr.error_correction == engine.AUTO_PLAIN_ERROR_CORRECTION
+
+
+def test_renditions_share_one_auto_choice(square_logo, tmp_path, monkeypatch):
+    chosen = []
+    real_make_qr = engine.make_qr
+
+    def recording_make_qr(*args, **kwargs):
+        qr = real_make_qr(*args, **kwargs)
+        chosen.append((qr.version, qr.error_correction, qr.modules))
+        return qr
+
+    monkeypatch.setattr(engine, "make_qr", recording_make_qr)
+    renditions = [engine.Rendition("png", box_size, output=str(tmp_path / f"code-{box_size}.png"))
+                  for box_size in (4, 8, 12, 32)]
+    saved = engine.generate_renditions("https://e.example/abc", renditions, square_logo,
+                                       error_correction="auto")
+    assert len(saved) == 4
+    assert len(chosen) == 1  # One encode for every rendition
+    sizes = {Image.open(path).size[0] // rendition.box_size
+             for path, rendition in zip(saved, renditions)}
+    assert len(sizes) == 1
+
+
+def test_generate_renditions_stops_when_cancelled(tmp_path):
+    renditions = [engine.Rendition("png", 4, output=str(tmp_path / "a.png")),
+                  engine.Rendition("svg", 4, output=str(tmp_path / "a.svg"))]
+    stages = []
+    result = engine.generate_renditions("cancel me", renditions, progress=stages.append,
+                                        cancelled=lambda: "render" in stages)
+    assert result is None
+    assert not (tmp_path / "a.svg").exists()
+
+
+@pytest.mark.parametrize("options", [dict(box_size=0), dict(box_size=-2), dict(border=-1),
+                                     dict(output_format="svg", box_size=-5)])
+def test_bad_sizes_are_rejected(options, tmp_path):
+    output = tmp_path / "code"
+    with pytest.raises(engine.GenerationError):
+        engine.generate("hello", output=str(output), **options)
+    assert not output.exists()
+
+
+def test_bad_rendition_sizes_are_rejected():
+    renditions = [engine.Rendition("png", 8), engine.Rendition("svg", 0)]
+    with pytest.raises(engine.GenerationError):
+        engine.generate_renditions("hello", renditions)
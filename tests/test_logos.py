@@ -0,0 +1,22 @@
+from PIL import Image
+
+from qrg import logos
+
+
+def test_stats_count_one_lookup_per_get(tmp_path):
+    path = str(tmp_path / "logo.png")
+    Image.new("RGBA", (64, 32), (255, 0, 0, 255)).save(path)
+    cache = logos.LogoCache()
+    loads = []
+    load = cache._load
+    cache._load = lambda p: loads.append(p) or load(p)
+
+    assert cache.get(path, 16).size == (16, 8)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert cache.get(path, 40).size == (40, 20)
+    assert (cache.hits, cache.misses) == (0, 2)
+    cache.get(path, 16)
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.source(path).size == (64, 32)
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert len(loads) == 1  # Decoded once for every size
@@ -0,0 +1,56 @@
+import random
+
+import numpy as np
+import pytest
+import qrcode
+from qrcode import util
+
+from qrg import matrix, segments
+
+LEVELS = (qrcode.constants.ERROR_CORRECT_L, qrcode.constants.ERROR_CORRECT_M,
+          qrcode.constants.ERROR_CORRECT_Q, qrcode.constants.ERROR_CORRECT_H)
+VERSIONS = (1, 2, 3, 6, 7, 9, 10, 14, 20, 26, 27, 33, 40)
+
+
+def _reference(data_list, version, error_correction):
+    """qrcode's own matrix for the same segments, version and ECC level."""
+    qr = qrcode.QRCode(version=version, error_correction=error_correction, border=0)
+    for data in data_list:
+        qr.add_data(data)
+    mask_pattern = qr.best_mask_pattern()
+    qr.makeImpl(False, mask_pattern)
+    return np.array(qr.modules, dtype=bool), mask_pattern
+
+
+def _payload(rng, version, error_correction):
+    """Random byte data that fills up to the capacity of the version."""
+    capacity = util.BIT_LIMIT_TABLE[error_correction][version] // 8 - 3
+    return bytes(rng.randrange(256) for _ in range(rng.randint(1, capacity)))
+
+
+@pytest.mark.parametrize("error_correction", LEVELS)
+@pytest.mark.parametrize("version", VERSIONS)
+def test_build_matches_qrcode(version, error_correction):
+    rng = random.Random(version * 4 + error_correction)
+    for _ in range(3):
+        data_list = [util.QRData(_payload(rng, version, error_correction), util.MODE_8BIT_BYTE)]
+        modules, mask_pattern = matrix.build(data_list, version, error_correction)
+        expected, expected_mask = _reference(data_list, version, error_correction)
+        assert mask_pattern == expected_mask
+        assert np.array_equal(modules, expected)
+
+
+@pytest.mark.parametrize("content", [
+    "https://intercuba.net",
+    "HELLO WORLD 1234567890",
+    "https://example.com/p/123456789012345678?ref=ABCDEFGH",
+    "31415926535" * 40,
+    "ñandú 😀 mixed payload " * 10,
+])
+@pytest.mark.parametrize("error_correction", LEVELS)
+def test_encode_matches_qrcode_for_the_same_segments(content, error_correction):
+    data_list, version = segments.fit(content, error_correction)
+    modules, fitted_version = matrix.encode(content, error_correction)
+    assert fitted_version == version
+    expected, _ = _reference(data_list, version, error_correction)
+    assert np.array_equal(modules, expected)
@@ -0,0 +1,70 @@
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from qrg import metrics
+
+
+@pytest.fixture
+def clean_hooks(monkeypatch):
+    monkeypatch.setattr(metrics, "hooks", [])
+    monkeypatch.setattr(metrics, "_env_hooks", {})
+
+
+def test_configure_from_env_is_idempotent(clean_hooks, tmp_path):
+    environ = {"QRG_METRICS_LOG": "1", "QRG_METRICS_TEXTFILE_DIR": str(tmp_path)}
+    metrics.configure_from_env(environ)
+    metrics.configure_from_env(environ)
+    assert len(metrics.hooks) == 2
+
+
+def _emit_events(count):
+    for _ in range(count):
+        metrics.emit(metrics.Timer(), format="png", cached=False)
+    return os.getpid()
+
+
+def _generations(path):
+    with open(path) as f:
+        return sum(int(n) for n in re.findall(r"^qrg_generations_total\{.*\} (\d+)$", f.read(), re.M))
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_workers_write_their_own_file(clean_hooks, tmp_path):
+    hook = metrics.add_hook(metrics.PrometheusTextfileHook(str(tmp_path), interval=60))
+    _emit_events(3)
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+        pids = set(pool.map(_emit_events, [5] * 4))
+    hook.flush()
+
+    files = {name: _generations(tmp_path / name) for name in os.listdir(tmp_path)}
+    assert files[f"qrg_{os.getpid()}.prom"] == 3
+    assert all(f"qrg_{pid}.prom" in files for pid in pids)
+    assert sum(files.values()) == 3 + 20
+
+
+_removed_hook = None
+
+
+def _removed_hook_counts():
+    return _removed_hook._count  # Reset to {} if the fork restarted the hook
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_removed_hooks_stay_stopped_in_forked_workers(clean_hooks, tmp_path):
+    global _removed_hook
+    removed = metrics.add_hook(metrics.PrometheusTextfileHook(str(tmp_path / "removed"), 60))
+    metrics.remove_hook(removed)
+    removed._count = {("png", "false"): 7}
+    _removed_hook = removed  # Inherited by the forked worker
+    kept = metrics.add_hook(metrics.PrometheusTextfileHook(str(tmp_path / "kept"), 60))
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        pid = pool.submit(_emit_events, 2).result()
+        assert pool.submit(_removed_hook_counts).result() == {("png", "false"): 7}
+    kept.flush()
+    assert _generations(tmp_path / "kept" / f"qrg_{pid}.prom") == 2
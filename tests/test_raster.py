@@ -0,0 +1,19 @@
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from qrg import engine
+
+
+@pytest.mark.parametrize("fill_color, back_color", [
+    ("black", "white"), ("navy", "yellow"), ("#336699", "white"), ("black", "#ffeecc"),
+])
+def test_to_image_matches_the_streamed_png(fill_color, back_color):
+    qr = engine.make_qr("https://intercuba.net", "M")
+    img = engine.render_png(qr, None, 5, None, fill_color, back_color)
+    buffer = BytesIO()
+    img.save(buffer)
+    streamed = Image.open(BytesIO(buffer.getvalue())).convert("RGB")
+    assert np.array_equal(np.asarray(img.to_image().convert("RGB")), np.asarray(streamed))
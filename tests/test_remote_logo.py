@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import BytesIO
+
+import pytest
+import requests
+from PIL import Image
+
+from qrg import remote_logo
+
+ETAG = '"logo-1"'
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+def _png(size=(200, 100)):
+    buffer = BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class LogoHandler(BaseHTTPRequestHandler):
+    """Serves one PNG with an ETag and answers matching revalidations with 304."""
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = _png()
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def logo_server():
+    srv = HTTPServer(("127.0.0.1", 0), LogoHandler)
+    srv.requests = []
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv, f"http://127.0.0.1:{srv.server_port}/logo.png"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_first_fetch_writes_the_thumbnail_and_metadata(logo_server, tmp_path):
+    srv, url = logo_server
+    img = remote_logo.refresh(url, str(tmp_path))
+    assert img.size == (50, 25)
+    assert "If-None-Match" not in srv.requests[0]
+
+    image_path = remote_logo.cached_image_path(url, str(tmp_path))
+    assert remote_logo.load_cached(url, str(tmp_path)).size == (50, 25)
+    with open(os.path.splitext(image_path)[0] + ".json", encoding="utf-8") as f:
+        meta = json.load(f)
+    assert meta == {"url": url, "etag": ETAG, "last_modified": LAST_MODIFIED}
+
+
+def test_revalidation_sends_validators_and_keeps_the_cache(logo_server, tmp_path):
+    srv, url = logo_server
+    remote_logo.refresh(url, str(tmp_path))
+    image_path = remote_logo.cached_image_path(url, str(tmp_path))
+    mtime = os.stat(image_path).st_mtime_ns
+
+    assert remote_logo.refresh(url, str(tmp_path)) is None
+    assert srv.requests[1]["If-None-Match"] == ETAG
+    assert srv.requests[1]["If-Modified-Since"] == LAST_MODIFIED
+    assert os.stat(image_path).st_mtime_ns == mtime
+
+
+def test_unreachable_server_leaves_the_cached_thumbnail(logo_server, tmp_path):
+    srv, url = logo_server
+    remote_logo.refresh(url, str(tmp_path))
+    srv.shutdown()
+    srv.server_close()  # Nothing listens on the port any more
+
+    with pytest.raises(requests.ConnectionError):
+        remote_logo.refresh(url, str(tmp_path), timeout=2)
+    assert remote_logo.load_cached(url, str(tmp_path)).size == (50, 25)
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+import qrcode
+from qrcode import util
+
+from qrg import segments
+
+LEVELS = (qrcode.constants.ERROR_CORRECT_L, qrcode.constants.ERROR_CORRECT_M,
+          qrcode.constants.ERROR_CORRECT_Q, qrcode.constants.ERROR_CORRECT_H)
+ALPHABETS = ("0123456789", "ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:", "abcdefghijklmnopqrstuvwxyz?=&_",
+             "äßé€", "日本語漢字")
+
+
+def _payloads(count, seed, kanji=False):
+    """Random mixes of numeric, alphanumeric, byte (and kanji) runs."""
+    rng = random.Random(seed)
+    alphabets = ALPHABETS if kanji else ALPHABETS[:-1]
+    for _ in range(count):
+        runs = [rng.choices(rng.choice(alphabets), k=rng.randint(1, 40))
+                for _ in range(rng.randint(1, 8))]
+        yield "".join(char for run in runs for char in run)
+
+
+def _written_bits(data_list, version):
+    """Length of the segment buffer qrcode's create_data writes for these segments."""
+    buffer = util.BitBuffer()
+    for data in data_list:
+        buffer.put(data.mode, 4)
+        buffer.put(len(data), util.length_in_bits(data.mode, version))
+        data.write(buffer)
+    return len(buffer)
+
+
+@pytest.mark.parametrize("kanji", [False, True])
+def test_reported_bits_match_the_written_segments(kanji):
+    for version in (1, 10, 27):
+        sizes = util.mode_sizes_for_version(version)
+        for text in _payloads(200, version, kanji):
+            modes, bits = segments.optimal_modes(text, sizes, kanji)
+            assert _written_bits(segments.make_segments(text, modes), version) == bits
+
+
+@pytest.mark.parametrize("error_correction", LEVELS)
+def test_never_larger_than_qrcode(error_correction):
+    for text in _payloads(150, error_correction):
+        qr = qrcode.QRCode(error_correction=error_correction)
+        qr.add_data(text)
+        try:
+            reference = qr.best_fit()  # The version make(fit=True) would use
+        except qrcode.exceptions.DataOverflowError:
+            continue
+        _, version = segments.fit(text, error_correction)
+        assert version <= reference
+
+
+def test_kanji_round_trip():
+    text = "日本語の漢字テキスト"
+    data = segments.KanjiData(text)
+    buffer = util.BitBuffer()
+    data.write(buffer)
+    assert len(buffer) == 13 * len(data) == 13 * len(text)
+
+    decoded = bytearray()
+    for i in range(len(data)):
+        value = sum(buffer.get(13 * i + bit) << (12 - bit) for bit in range(13))
+        code = (value // 0xC0) << 8 | value % 0xC0
+        code += 0x8140 if code < 0x1F00 else 0xC140
+        decoded += code.to_bytes(2, "big")
+    assert decoded.decode("shift_jis") == text
+
+
+def test_kanji_mode_is_opt_in():
+    sizes = util.mode_sizes_for_version(1)
+    assert util.MODE_KANJI not in segments.optimal_modes("漢字", sizes)[0]
+    assert segments.optimal_modes("漢字", sizes, kanji=True)[0] == [util.MODE_KANJI] * 2
@@ -0,0 +1,112 @@
+import http.client
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from qrg import engine, server
+
+
+class ImmediatePool:
+    """Runs each job at submit time, so the returned future is already done."""
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self):
+        pass
+
+
+@pytest.fixture
+def service():
+    service = server.QRService(workers=1)
+    service.pool.shutdown()
+    service.pool = ImmediatePool()
+    yield service
+    service.close()
+
+
+def _in_thread(fn, timeout=10):
+    errors = []
+
+    def run():
+        try:
+            fn()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "render deadlocked"
+    return errors
+
+
+def test_fast_failing_requests_do_not_deadlock(service):
+    options = service.parse({"content": "x" * 5000})
+
+    def render_many():
+        for _ in range(100):
+            with pytest.raises(server.RequestError):
+                service.render(options)
+
+    assert _in_thread(render_many) == []
+    assert service.stats()["inflight"] == 0
+
+
+def test_fast_succeeding_requests_do_not_deadlock(service):
+    def render_many():
+        for i in range(20):
+            service.render(service.parse({"content": f"https://a.example/{i}"}))
+
+    assert _in_thread(render_many) == []
+    assert service.cache.stats()["entries"] == 20
+
+
+@pytest.fixture
+def http_server():
+    srv, service = server.make_server(port=0, workers=1)
+    service.pool.shutdown()
+    service.pool = ImmediatePool()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv, service
+    srv.shutdown()
+    srv.server_close()
+
+
+def _request(srv, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", srv.server_port, timeout=10)
+    conn.request(method, path, body, headers or {})
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response, data
+
+
+def test_revalidation_does_not_render(http_server):
+    srv, service = http_server
+    options = service.parse({"content": "https://a.example/etag"})
+    etag = f'"{engine.request_key(**options)}"'
+    response, _ = _request(srv, "GET", "/qr?content=https://a.example/etag",
+                           headers={"If-None-Match": etag})
+    assert response.status == 304
+    assert response.getheader("ETag") == etag
+    assert service.pool.submitted == 0
+
+
+def test_bad_content_length_is_a_400(http_server):
+    srv, _ = http_server
+    response, _ = _request(srv, "POST", "/qr", headers={"Content-Length": "abc"})
+    assert response.status == 400
+    response, data = _request(srv, "GET", "/qr?content=still-serving")
+    assert response.status == 200 and data.startswith(b"\x89PNG")